@@ -0,0 +1,153 @@
+# Contador/almacen.py
+# Almacén de planillas ya procesadas, del lado del servidor. Cada planilla se guarda una sola
+# vez como un blob binario (montos como int64 en su escala + tabla de IDs) bajo el hash de su contenido;
+# la sesión sólo guarda esa clave. Las entradas que no se usan en DATASET_TTL segundos vencen.
+import hashlib
+import os
+import struct
+import sys
+import tempfile
+import time
+from array import array
+
+from flask import current_app
+
+import dinero
+
+_MAGIC = b'CTDS2'
+_CABECERA = struct.Struct('<5sIB')  # magic, cantidad de filas, escala de los montos
+# Formato anterior, sin escala: los montos siempre en centavos.
+_MAGIC_V1 = b'CTDS1'
+_CABECERA_V1 = struct.Struct('<5sI')
+_SEPARADOR_ID = '\x00'
+
+
+class Dataset:
+    __slots__ = ('clave', 'ids', 'centavos', 'escala')
+
+    def __init__(self, clave, ids, centavos, escala=dinero.ESCALA):
+        self.clave = clave
+        self.ids = ids
+        self.centavos = centavos
+        self.escala = escala
+
+    def __len__(self):
+        return len(self.ids)
+
+    def filas(self):
+        """Filas (id, monto) con el monto entero en unidades de 10**-escala, como las recibe el solver."""
+        return list(zip(self.ids, self.centavos))
+
+    def como_lista(self):
+        return [[item_id, dinero.formatear(c, self.escala)] for item_id, c in zip(self.ids, self.centavos)]
+
+
+def _directorio():
+    directorio = current_app.config['DATASET_DIR']
+    os.makedirs(directorio, exist_ok=True)
+    return directorio
+
+
+def _ruta(clave):
+    if len(clave) != 64 or not all(c in '0123456789abcdef' for c in clave):
+        raise KeyError(clave)
+    return os.path.join(_directorio(), clave + '.bin')
+
+
+def _serializar(ids, centavos, escala):
+    montos = array('q', centavos)
+    if sys.byteorder != 'little':
+        montos.byteswap()
+    return b''.join((_CABECERA.pack(_MAGIC, len(montos), escala), montos.tobytes(),
+                     _SEPARADOR_ID.join(ids).encode('utf-8')))
+
+
+def _deserializar(clave, blob):
+    if blob[:len(_MAGIC_V1)] == _MAGIC_V1:
+        cabecera = _CABECERA_V1
+        _, cantidad = cabecera.unpack_from(blob)
+        escala = dinero.ESCALA
+    else:
+        cabecera = _CABECERA
+        magic, cantidad, escala = cabecera.unpack_from(blob)
+        if magic != _MAGIC:
+            raise ValueError(f"Dataset {clave} con formato desconocido.")
+    fin_montos = cabecera.size + 8 * cantidad
+    centavos = array('q')
+    centavos.frombytes(blob[cabecera.size:fin_montos])
+    if sys.byteorder != 'little':
+        centavos.byteswap()
+    ids = blob[fin_montos:].decode('utf-8').split(_SEPARADOR_ID) if cantidad else []
+    return Dataset(clave, ids, centavos, escala)
+
+
+def guardar(ids, centavos, escala=dinero.ESCALA):
+    """Guarda la planilla (si no estaba ya) y devuelve su clave. La escala entra en el hash:
+    los mismos enteros en otra escala son otra planilla.
+    """
+    blob = _serializar(ids, centavos, escala)
+    clave = hashlib.sha256(blob).hexdigest()
+    ruta = _ruta(clave)
+    if os.path.exists(ruta):
+        os.utime(ruta)
+    else:
+        # Escritura atómica: otro worker nunca ve un archivo a medio escribir.
+        descriptor, temporal = tempfile.mkstemp(dir=_directorio(), suffix='.tmp')
+        with os.fdopen(descriptor, 'wb') as archivo:
+            archivo.write(blob)
+        os.replace(temporal, ruta)
+    purgar_vencidos()
+    return clave
+
+
+def _leer(clave, cantidad=-1):
+    # Primeros `cantidad` bytes (todos con -1) del archivo de la clave, o None si no existe o ya venció.
+    try:
+        ruta = _ruta(clave)
+        if time.time() - os.path.getmtime(ruta) > current_app.config['DATASET_TTL']:
+            eliminar(clave)
+            return None
+        with open(ruta, 'rb') as archivo:
+            blob = archivo.read(cantidad)
+        os.utime(ruta)  # Cada uso renueva el plazo de vencimiento.
+    except (KeyError, OSError):
+        return None
+    return blob
+
+
+def cargar(clave):
+    """Devuelve el Dataset de la clave, o None si no existe o ya venció."""
+    blob = _leer(clave)
+    return None if blob is None else _deserializar(clave, blob)
+
+
+def leer_escala(clave):
+    """Escala de los montos de la planilla leyendo sólo su cabecera, o None si no existe o ya venció."""
+    cabecera = _leer(clave, _CABECERA.size)
+    if cabecera is None:
+        return None
+    if cabecera[:len(_MAGIC_V1)] == _MAGIC_V1:
+        return dinero.ESCALA
+    magic, _, escala = _CABECERA.unpack(cabecera)
+    if magic != _MAGIC:
+        raise ValueError(f"Dataset {clave} con formato desconocido.")
+    return escala
+
+
+def eliminar(clave):
+    try:
+        os.remove(_ruta(clave))
+    except (KeyError, OSError):
+        pass
+
+
+def purgar_vencidos():
+    directorio = _directorio()
+    limite = time.time() - current_app.config['DATASET_TTL']
+    for nombre in os.listdir(directorio):
+        ruta = os.path.join(directorio, nombre)
+        try:
+            if os.path.getmtime(ruta) < limite:
+                os.remove(ruta)
+        except OSError:
+            pass
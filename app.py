@@ -1,288 +1,175 @@
 # -----------------------------------------------------------------------------
 # SECCIÓN 1: IMPORTACIONES
 # -----------------------------------------------------------------------------
+# Sólo lo necesario para arrancar: pandas, openpyxl y el solver se importan recién cuando
+# los usa el calculador (ver calculador_bp/routes.py).
 import os
-import io
-import time
-from decimal import Decimal, getcontext, InvalidOperation
 from datetime import datetime
-import pandas as pd
-from flask import Flask, render_template, request, redirect, url_for, session
-from flask_sqlalchemy import SQLAlchemy
-from flask_login import LoginManager, login_required # UserMixin se usa en models.py
+
+import click
+from flask import Flask, render_template, current_app
+from flask.cli import with_appcontext
 from dotenv import load_dotenv
+
 from extensions import db, login_manager
+from models import User
+from cache_resultados import CacheResultados
+from cache_usuarios import CacheUsuarios
+from auth_bp.routes import auth_bp
+from herramientas_bp.routes import herramientas_bp
+from calculador_bp.routes import calculador_bp, precargar
 
 # --- Cargar variables de entorno desde .env PRIMERO ---
 load_dotenv()
 
 # -----------------------------------------------------------------------------
-# SECCIÓN 2: CREACIÓN DE INSTANCIAS DE EXTENSIONES (SIN APP AÚN)
-# -----------------------------------------------------------------------------
-# Crea las instancias de las extensiones aquí, ANTES de crear 'app'
-# y ANTES de que 'models.py' o los blueprints intenten importarlas.
-#db = SQLAlchemy()
-#login_manager = LoginManager()
-# login_manager.login_view y otros atributos se configurarán después de init_app
-
-# Variables globales para rastrear si los módulos se cargaron
-MODELS_DISPONIBLES = False
-User = None # Definir User globalmente, se asignará después de importar models
-
-# -----------------------------------------------------------------------------
-# SECCIÓN 3: CREACIÓN Y CONFIGURACIÓN DE LA APLICACIÓN FLASK
-# -----------------------------------------------------------------------------
-app = Flask(__name__)
-app.secret_key = os.environ.get('SECRET_KEY', 'UNA_CLAVE_SECRETA_MUY_FUERTE_PARA_DESARROLLO_LOCAL_CAMBIAME')
-
-DB_USERNAME = os.environ.get('DB_USERNAME_PA')
-# ... (resto de tu config de DB_PASSWORD, DB_HOST, DB_NAME) ...
-DB_PASSWORD = os.environ.get('DB_PASSWORD_PA')
-DB_HOST = os.environ.get('DB_HOST_PA')
-DB_NAME = os.environ.get('DB_NAME_PA')
-
-
-if all([DB_USERNAME, DB_PASSWORD, DB_HOST, DB_NAME]):
-    app.config['SQLALCHEMY_DATABASE_URI'] = \
-        f"mysql+pymysql://{DB_USERNAME}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
-else:
-    print("ADVERTENCIA: Variables de entorno para MySQL no configuradas. Usando SQLite local ('local_db.sqlite').")
-    basedir = os.path.abspath(os.path.dirname(__file__))
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, 'local_db.sqlite')
-
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# --- INICIALIZAR EXTENSIONES CON LA APP ---
-db.init_app(app) # <--- Usa la instancia db importada de extensions.py
-login_manager.init_app(app) # <--- Usa la instancia login_manager importada
-login_manager.login_view = 'auth.login'
-login_manager.login_message = "Por favor, inicia sesión para acceder a esta página."
-login_manager.login_message_category = "info"
-
-# -----------------------------------------------------------------------------
-# SECCIÓN 4: IMPORTACIÓN DE MODELOS Y CONFIGURACIÓN DE USER LOADER
-# -----------------------------------------------------------------------------
-# Ahora 'models.py' puede hacer 'from app import db' de forma segura,
-# porque 'db' ya existe como objeto SQLAlchemy (aunque se vincule a 'app' completamente con init_app).
-try:
-    from models import User as UserModel # models.py ahora importará db de extensions.py
-    User = UserModel
-    MODELS_DISPONIBLES = True
-
-    @login_manager.user_loader
-    def load_user(user_id):
-        if User:
-            return User.query.get(int(user_id))
-        return None
-except ImportError as e:
-    MODELS_DISPONIBLES = False
-    print(f"ADVERTENCIA: No se pudo importar el modelo User: {e}.")
-    @login_manager.user_loader
-    def load_user(user_id): # pragma: no cover
-        print("ADVERTENCIA: load_user llamado, pero el modelo User no está disponible.")
+# SECCIÓN 2: CONFIGURACIÓN
+# -----------------------------------------------------------------------------
+def _configurar(app):
+    app.secret_key = os.environ.get('SECRET_KEY', 'UNA_CLAVE_SECRETA_MUY_FUERTE_PARA_DESARROLLO_LOCAL_CAMBIAME')
+
+    DB_USERNAME = os.environ.get('DB_USERNAME_PA')
+    DB_PASSWORD = os.environ.get('DB_PASSWORD_PA')
+    DB_HOST = os.environ.get('DB_HOST_PA')
+    DB_NAME = os.environ.get('DB_NAME_PA')
+
+    if all([DB_USERNAME, DB_PASSWORD, DB_HOST, DB_NAME]):
+        app.config['SQLALCHEMY_DATABASE_URI'] = \
+            f"mysql+pymysql://{DB_USERNAME}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
+        # Pool de conexiones: pre_ping descarta conexiones que MySQL ya cerró y recycle las renueva
+        # antes del wait_timeout del servidor (300s en PythonAnywhere).
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            'pool_size': int(os.environ.get('DB_POOL_SIZE', '5')),
+            'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', '10')),
+            'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1').lower() not in ('0', 'false', 'no'),
+            'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', '280')),
+        }
+    else:
+        print("ADVERTENCIA: Variables de entorno para MySQL no configuradas. Usando SQLite local ('local_db.sqlite').")
+        basedir = os.path.abspath(os.path.dirname(__file__))
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, 'local_db.sqlite')
+
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Motor del CombinacionSolver: 'auto' (por defecto), 'bnb', 'dp' o 'mitm'.
+    app.config['SOLVER_ENGINE'] = os.environ.get('SOLVER_ENGINE', 'auto')
+    # Procesos para la búsqueda 'bnb' (1 = serial, en el mismo proceso de la request).
+    app.config['SOLVER_WORKERS'] = int(os.environ.get('SOLVER_WORKERS', '1'))
+    app.config['SOLVER_TIME_LIMIT'] = int(os.environ.get('SOLVER_TIME_LIMIT', '30'))
+    # Máximo de combinaciones alternativas que se guardan por búsqueda y cuántas se muestran por página.
+    app.config['SOLVER_MAX_ALTERNATIVAS'] = int(os.environ.get('SOLVER_MAX_ALTERNATIVAS', '100'))
+    app.config['ALTERNATIVAS_POR_PAGINA'] = int(os.environ.get('ALTERNATIVAS_POR_PAGINA', '10'))
+    # Búsquedas del calculador que pueden correr a la vez en cada proceso (ver trabajos.py).
+    app.config['SOLVER_MAX_JOBS'] = int(os.environ.get('SOLVER_MAX_JOBS', '2'))
+    # Segundos sin latido tras los cuales un trabajo en cola o en proceso se da por perdido
+    # (el worker que lo tenía se reinició) y se marca como error.
+    app.config['SOLVER_TRABAJO_ABANDONO'] = int(os.environ.get('SOLVER_TRABAJO_ABANDONO', '60'))
+    # Planillas procesadas guardadas en el servidor (ver almacen.py) y segundos sin uso hasta que vencen.
+    app.config['DATASET_DIR'] = os.environ.get('DATASET_DIR', os.path.join(app.instance_path, 'datasets'))
+    app.config['DATASET_TTL'] = int(os.environ.get('DATASET_TTL', str(24 * 3600)))
+    # Decimales de los montos de las planillas nuevas: se leen como enteros en unidades de 10**-escala (ver dinero.py).
+    app.config['MONTO_ESCALA'] = int(os.environ.get('MONTO_ESCALA', '2'))
+    # Caché de resultados: entradas LRU por proceso y, si se indica un archivo, un nivel SQLite compartido.
+    app.config['RESULT_CACHE_SIZE'] = int(os.environ.get('RESULT_CACHE_SIZE', '256'))
+    app.config['RESULT_CACHE_SQLITE'] = os.environ.get('RESULT_CACHE_SQLITE')
+    # Segundos que el user_loader reusa un usuario ya leído sin volver a la base (0 = sin caché).
+    app.config['USER_CACHE_TTL'] = int(os.environ.get('USER_CACHE_TTL', '30'))
+    # Importar pandas, openpyxl y el solver al crear la app en lugar de en la primera request del
+    # calculador. Con gunicorn --preload se importan una vez en el maestro y los workers los heredan.
+    app.config['CALCULADOR_PRECARGAR'] = os.environ.get('CALCULADOR_PRECARGAR', '0').lower() in ('1', 'true', 'si', 'sí')
+
+# -----------------------------------------------------------------------------
+# SECCIÓN 3: USER LOADER
+# -----------------------------------------------------------------------------
+@login_manager.user_loader
+def load_user(user_id):
+    # Se llama en cada request con sesión iniciada: primero se busca en la caché (ver cache_usuarios.py).
+    try:
+        return current_app.extensions['cache_usuarios'].cargar(db.session, int(user_id))
+    except ValueError:
         return None
 
 # -----------------------------------------------------------------------------
-# SECCIÓN 5: IMPORTACIÓN Y REGISTRO DE BLUEPRINTS
-# -----------------------------------------------------------------------------
-# Los blueprints pueden ahora importar 'db' de 'app' y 'User' de 'models' de forma segura.
-try:
-    from herramientas_bp.routes import herramientas_bp
-    app.register_blueprint(herramientas_bp)
-    print("INFO: Blueprint 'herramientas_bp' registrado.")
-except ImportError as e:
-    print(f"Advertencia: No se pudo importar o registrar 'herramientas_bp': {e}.")
-
-try:
-    from auth_bp.routes import auth_bp
-    app.register_blueprint(auth_bp)
-    print("INFO: Blueprint 'auth_bp' registrado.")
-except ImportError as e:
-    print(f"Advertencia: No se pudo importar o registrar 'auth_bp': {e}.")
-
-
-
-# -----------------------------------------------------------------------------
-# SECCIÓN 6: DEFINICIONES DE CLASES AUXILIARES (si las hay)
+# SECCIÓN 4: RUTAS PRINCIPALES, PROCESADOR DE CONTEXTO Y COMANDOS CLI
 # -----------------------------------------------------------------------------
-class CombinacionSolver:
-    # ... (Tu clase CombinacionSolver completa aquí sin cambios internos) ...
-    def __init__(self, items_original_lista, monto_objetivo_str, time_limit_seconds=30):
-        self.items_procesados = []
-        try:
-            self.monto_objetivo = Decimal(monto_objetivo_str)
-        except InvalidOperation:
-            raise ValueError("El monto objetivo ingresado no es un número válido.")
-
-        self.time_limit_seconds = time_limit_seconds
-        self.start_time = 0
-        self.time_limit_exceeded_flag = False 
-
-        self.best_sum_found = Decimal('0')
-        self.best_selection_items_data = [] 
-
-        if self.monto_objetivo <= 0:
-            return
-
-        for idx, data_row in enumerate(items_original_lista): 
-            try:
-                item_id = data_row[0]
-                monto_val_str = str(data_row[1]) 
-                monto = Decimal(monto_val_str)
-                if monto <= Decimal('0'): 
-                    continue
-                self.items_procesados.append({
-                    'id': item_id,
-                    'monto': monto,
-                })
-            except Exception as e:
-                print(f"WARN [CombinacionSolver]: Item inválido omitido: {data_row} debido a {e}")
-                continue
-        
-        self.items_procesados.sort(key=lambda x: x['monto'], reverse=True)
-        self.num_items = len(self.items_procesados)
-        
-        self.remaining_sum_array = [Decimal('0')] * (self.num_items + 1)
-        if self.num_items > 0:
-            current_remaining_sum = Decimal('0')
-            for i in range(self.num_items - 1, -1, -1):
-                current_remaining_sum += self.items_procesados[i]['monto']
-                self.remaining_sum_array[i] = current_remaining_sum
-        
-    def _solve_recursive(self, index, current_sum, current_selection_data):
-        if self.time_limit_exceeded_flag: return
-        if time.time() - self.start_time > self.time_limit_seconds:
-            self.time_limit_exceeded_flag = True
-            print(f"INFO [CombinacionSolver]: Límite de tiempo de {self.time_limit_seconds}s alcanzado.")
-            return
-        if current_sum <= self.monto_objetivo and current_sum > self.best_sum_found:
-            self.best_sum_found = current_sum
-            self.best_selection_items_data = list(current_selection_data) 
-        if index == self.num_items: return
-        if current_sum + self.remaining_sum_array[index] < self.best_sum_found: return
-        item_actual = self.items_procesados[index]
-        if current_sum + item_actual['monto'] <= self.monto_objetivo: 
-            current_selection_data.append(item_actual)
-            self._solve_recursive(index + 1, current_sum + item_actual['monto'], current_selection_data)
-            current_selection_data.pop() 
-            if self.time_limit_exceeded_flag: return
-        self._solve_recursive(index + 1, current_sum, current_selection_data)
-
-    def find_combination(self):
-        if self.monto_objetivo <= 0 or not self.items_procesados:
-            return [], Decimal('0'), self.monto_objetivo, self.time_limit_exceeded_flag
-        self.start_time = time.time()
-        self.time_limit_exceeded_flag = False 
-        self.best_sum_found = Decimal('0')
-        self.best_selection_items_data = []
-        self._solve_recursive(0, Decimal('0'), [])
-        final_combination_output = []
-        for item_data in self.best_selection_items_data:
-            final_combination_output.append((item_data['id'], item_data['monto']))
-        elapsed_time = time.time() - self.start_time
-        print(f"INFO [CombinacionSolver]: Búsqueda completada en {elapsed_time:.2f}s. Mejor suma: {self.best_sum_found}")
-        if self.time_limit_exceeded_flag:
-            print("WARN [CombinacionSolver]: La búsqueda fue terminada por límite de tiempo...")
-        return final_combination_output, self.best_sum_found, self.monto_objetivo, self.time_limit_exceeded_flag
-
-# -----------------------------------------------------------------------------
-# SECCIÓN 7: RUTAS PRINCIPALES DE LA APLICACIÓN (app.py)
-# -----------------------------------------------------------------------------
-@app.route('/')
+# Las rutas del calculador viven en calculador_bp/routes.py.
 def home():
     return render_template('home.html', titulo_pagina="Bienvenido a Agilize Soluciones")
 
-@app.route('/calculador', methods=['GET', 'POST'])
-@login_required 
-def calculador():
-    # ... (Tu lógica de la ruta /calculador) ...
-    titulo_actual = "Calculador: Comparador de Montos Excel" 
-    if request.method == 'POST':
-        if 'excel_file' in request.files:
-            file = request.files['excel_file']
-            if file.filename == '':
-                return render_template('calculador.html', error_excel="No se seleccionó ningún archivo.", titulo_pagina=titulo_actual)
-            if file and (file.filename.endswith('.xlsx') or file.filename.endswith('.xls')):
-                try:
-                    file_stream = io.BytesIO(file.read())
-                    df = pd.read_excel(file_stream, engine='openpyxl')
-                    file_stream.close() 
-                    column_id_name = None; column_monto_name = None
-                    possible_id_cols = ['ID', 'Id', 'id', 'Comprobante', 'COMPROBANTE', 'Numero', 'Número']
-                    possible_monto_cols = ['Monto', 'MONTO', 'Importe', 'IMPORTE', 'Valor', 'VALOR', 'Total', 'TOTAL']
-                    for col_name_excel in df.columns:
-                        if column_id_name is None and col_name_excel.strip().lower() in [p.lower() for p in possible_id_cols]: column_id_name = col_name_excel
-                        if column_monto_name is None and col_name_excel.strip().lower() in [p.lower() for p in possible_monto_cols]: column_monto_name = col_name_excel
-                        if column_id_name and column_monto_name: break
-                    if not column_id_name or not column_monto_name:
-                        return render_template('calculador.html', error_excel="Columnas ID/Monto no encontradas. Cols: " + ", ".join(df.columns), titulo_pagina=titulo_actual)
-                    excel_data_list = []
-                    for _, row in df.iterrows():
-                        try:
-                            id_val = str(row[column_id_name]); monto_val = str(row[column_monto_name]) 
-                            Decimal(monto_val); excel_data_list.append([id_val, monto_val])
-                        except (InvalidOperation, KeyError, ValueError) as e_row :
-                            app.logger.warning(f"Omitiendo fila: ID='{row.get(column_id_name)}', Monto='{row.get(column_monto_name)}'. Error: {e_row}")
-                    if not excel_data_list:
-                         return render_template('calculador.html', error_excel="No se encontraron datos válidos de ID y Monto.", titulo_pagina=titulo_actual)
-                    session['excel_data'] = excel_data_list; session['filename'] = file.filename
-                    return redirect(url_for('calculador')) 
-                except Exception as e:
-                    app.logger.error(f"Error leyendo Excel: {e}", exc_info=True)
-                    return render_template('calculador.html', error_excel=f"Error al leer Excel: {e}", titulo_pagina=titulo_actual)
-            else:
-                return render_template('calculador.html', error_excel="Formato de archivo no válido.", titulo_pagina=titulo_actual)
-        elif 'monto_objetivo' in request.form and 'excel_data' in session:
-            monto_objetivo_str = request.form['monto_objetivo']; items_excel = session['excel_data'] 
-            time_limit_config = 30 
-            try:
-                solver = CombinacionSolver(items_excel, monto_objetivo_str, time_limit_seconds=time_limit_config)
-                combinacion, suma_obtenida, monto_objetivo_decimal, time_exceeded = solver.find_combination()
-                suma_obtenida_str_disp = f"{suma_obtenida:.2f}"; monto_objetivo_str_disp = f"{monto_objetivo_decimal:.2f}"
-                combinacion_display = [(item_id, f"{monto_val:.2f}") for item_id, monto_val in combinacion]
-                return render_template('calculador_results.html', combinacion=combinacion_display, suma_obtenida=suma_obtenida_str_disp, monto_objetivo=monto_objetivo_str_disp,filename=session.get('filename'),time_exceeded=time_exceeded,time_limit_config=time_limit_config,titulo_pagina="Resultados del Calculador") 
-            except ValueError as e: 
-                 app.logger.error(f"Error en solver: {e}", exc_info=True)
-                 return render_template('calculador.html', excel_cargado=True,filename=session.get('filename'),error_monto=str(e), titulo_pagina=titulo_actual)
-            except Exception as e_general:
-                 app.logger.error(f"Error inesperado: {e_general}", exc_info=True)
-                 return render_template('calculador.html', excel_cargado=True,filename=session.get('filename'),error_monto=f"Error inesperado: {e_general}", titulo_pagina=titulo_actual)
-    excel_cargado = 'excel_data' in session; filename = session.get('filename') if excel_cargado else None
-    return render_template('calculador.html', excel_cargado=excel_cargado, filename=filename, titulo_pagina=titulo_actual)
-
-@app.route('/calculador/reset') 
-@login_required 
-def reset_calculador():
-    session.pop('excel_data', None)
-    session.pop('filename', None)
-    return redirect(url_for('calculador')) 
+def inject_now():
+    return {'now': datetime.utcnow()}
 
-# -----------------------------------------------------------------------------
-# SECCIÓN 8: COMANDOS CLI (como init-db)
-# -----------------------------------------------------------------------------
-@app.cli.command("init-db")
+def _agregar_columnas_faltantes():
+    # create_all no modifica tablas que ya existen: las columnas nuevas de los modelos (con valor
+    # por defecto en el servidor o que admiten NULL) se agregan acá.
+    inspector = db.inspect(db.engine)
+    dialecto = db.engine.dialect
+    for tabla in db.metadata.sorted_tables:
+        existentes = {columna['name'] for columna in inspector.get_columns(tabla.name)}
+        for columna in tabla.columns:
+            if columna.name in existentes:
+                continue
+            definicion = f"{columna.name} {columna.type.compile(dialect=dialecto)}"
+            if columna.server_default is not None:
+                definicion += f" DEFAULT {columna.server_default.arg.compile(dialect=dialecto)}"
+            if not columna.nullable:
+                definicion += " NOT NULL"
+            with db.engine.begin() as conexion:
+                conexion.exec_driver_sql(f"ALTER TABLE {tabla.name} ADD COLUMN {definicion}")
+            print(f"Columna agregada: {tabla.name}.{columna.name}")
+
+@click.command("init-db")
+@with_appcontext
 def init_db_command():
-    if not MODELS_DISPONIBLES or User is None:
-        print("Error: Modelos de base de datos (User) no disponibles.")
-        return
     try:
-        with app.app_context(): # Importante para operaciones de DB fuera de una request
-            db.create_all()
+        db.create_all()
+        _agregar_columnas_faltantes()
         print("Base de datos inicializada y tablas creadas.")
     except Exception as e:
         print(f"Error al inicializar la base de datos: {e}")
 
 # -----------------------------------------------------------------------------
-# SECCIÓN 9: PROCESADOR DE CONTEXTO PARA PLANTILLAS
+# SECCIÓN 5: FÁBRICA DE LA APLICACIÓN
 # -----------------------------------------------------------------------------
-@app.context_processor
-def inject_now():
-    return {'now': datetime.utcnow()}
+def create_app(config=None):
+    """Crea y configura la aplicación. config (dict) pisa la configuración leída del entorno."""
+    app = Flask(__name__)
+    _configurar(app)
+    if config:
+        app.config.update(config)
+
+    db.init_app(app)
+    login_manager.init_app(app)
+    login_manager.login_view = 'auth.login'
+    login_manager.login_message = "Por favor, inicia sesión para acceder a esta página."
+    login_manager.login_message_category = "info"
+
+    app.extensions['cache_usuarios'] = CacheUsuarios(User, app.config['USER_CACHE_TTL'])
+    app.extensions['cache_resultados'] = CacheResultados(app.config['RESULT_CACHE_SIZE'], app.config['RESULT_CACHE_SQLITE'])
+
+    app.register_blueprint(herramientas_bp)
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(calculador_bp)
+    app.add_url_rule('/', 'home', home)
+    app.context_processor(inject_now)
+    app.cli.add_command(init_db_command)
+
+    if app.config['CALCULADOR_PRECARGAR']:
+        precargar()
+    return app
+
+def __getattr__(nombre):
+    # `from app import app` (WSGI de PythonAnywhere, `gunicorn app:app`, `flask --app app`) sigue
+    # funcionando: la aplicación se crea la primera vez que se pide y queda en el módulo.
+    if nombre == 'app':
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
 
 # -----------------------------------------------------------------------------
-# SECCIÓN 10: EJECUCIÓN PARA DESARROLLO LOCAL
+# SECCIÓN 6: EJECUCIÓN PARA DESARROLLO LOCAL
 # -----------------------------------------------------------------------------
 if __name__ == '__main__':
     import logging
-    logging.basicConfig(level=logging.INFO) 
-    app.run(debug=True)
\ No newline at end of file
+    logging.basicConfig(level=logging.INFO)
+    create_app().run(debug=True)
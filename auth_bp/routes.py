@@ -1,4 +1,4 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
 from flask_login import login_user, logout_user, current_user, login_required # Añade login_required
 
 # Asegúrate de que estas importaciones sean correctas según tu estructura
@@ -41,13 +41,15 @@ def login():
 
     form = LoginForm()
     if form.validate_on_submit():
-        user = User.query.filter_by(username=form.username.data).first() # Busca al usuario
+        # username es único (con índice): una sola fila. check_password es lento a propósito.
+        user = db.session.execute(db.select(User).filter_by(username=form.username.data)).scalar_one_or_none()
         # Podrías permitir login con email también:
         # user_by_email = User.query.filter_by(email=form.username.data).first()
         # user = user_by_username if user_by_username else user_by_email
 
         if user and user.check_password(form.password.data): # Verifica usuario y contraseña
             login_user(user, remember=form.remember_me.data) # Inicia sesión con Flask-Login
+            current_app.extensions['cache_usuarios'].guardar(user)  # La próxima request no vuelve a la base
             flash('¡Has iniciado sesión correctamente!', 'success')
 
             # Redirigir a la página que intentaba acceder, o al dashboard de herramientas
@@ -61,6 +63,7 @@ def login():
 @auth_bp.route('/logout')
 @login_required # Solo usuarios logueados pueden desloguearse
 def logout():
+    current_app.extensions['cache_usuarios'].invalidar(current_user.id)
     logout_user() # Desloguea al usuario con Flask-Login
     flash('Has cerrado sesión.', 'info')
     return redirect(url_for('auth.login')) # O a la página principal 'h
\ No newline at end of file
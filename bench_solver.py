@@ -0,0 +1,152 @@
+# bench_solver.py
+# Benchmark reproducible de los motores de CombinacionSolver.
+#
+#   python bench_solver.py                       # escenarios por defecto
+#   python bench_solver.py --tamanos 40,160 --limite 5 --engines bnb,dp
+#
+# Genera planillas sintéticas con semilla fija (montos con dos decimales, muchos repetidos)
+# y objetivos factibles, infactibles y "casi", más la planilla de ejemplo de uploads/.
+# Por cada corrida registra tiempo, nodos explorados, pico de memoria y brecha contra la
+# mejor suma conocida, y agrega una línea JSON por corrida al archivo de salida para poder
+# comparar entre commits.
+import argparse
+import json
+import os
+import random
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+
+import dinero
+import ingesta
+from solver import CombinacionSolver, DP_MAX_BITS, MITM_MAX_ITEMS
+
+PLANILLA_EJEMPLO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads', 'Montos y remitos.xlsx')
+
+
+def _texto(centavos):
+    return dinero.formatear(centavos)
+
+
+def planilla_sintetica(rng, n, distintos, paso=1):
+    """n items con montos elegidos de un conjunto de `distintos` valores (múltiplos de `paso` centavos)."""
+    valores = [rng.randint(1000, 5000000) // paso * paso for _ in range(distintos)]
+    # Distribución sesgada: pocos montos se repiten mucho, como en los remitos reales.
+    pesos = [1 / (i + 1) for i in range(distintos)]
+    return [[f"S{i:06d}", rng.choices(valores, pesos)[0]] for i in range(n)]
+
+
+def objetivos(rng, centavos, paso):
+    """Objetivos (tipo, centavos): factible (suma de un subconjunto), infactible (no alcanzable
+    exacto porque todos los montos son múltiplos de `paso`) y casi (un centavo menos que uno factible).
+    """
+    subconjunto = sum(rng.sample(centavos, max(1, len(centavos) // 3)))
+    resultado = [('factible', subconjunto), ('casi', subconjunto - 1)]
+    if paso > 1:
+        resultado.append(('infactible', subconjunto + paso // 2))
+    return resultado
+
+
+def escenarios(semilla, tamanos, incluir_ejemplo):
+    rng = random.Random(semilla)
+    for n in tamanos:
+        for nombre, distintos, paso in (('repetidos', max(2, n // 8), 5), ('variados', n, 5)):
+            filas = planilla_sintetica(rng, n, distintos, paso)
+            for tipo, objetivo in objetivos(rng, [c for _, c in filas], paso):
+                yield f"{nombre}-{n}-{tipo}", filas, objetivo
+    if incluir_ejemplo and os.path.exists(PLANILLA_EJEMPLO):
+        datos = ingesta.leer_archivo(PLANILLA_EJEMPLO)
+        for tipo, objetivo in objetivos(rng, list(datos.centavos), 1):
+            yield f"ejemplo-{len(datos)}-{tipo}", list(zip(datos.ids, datos.centavos)), objetivo
+
+
+def aplicable(engine, items, objetivo):
+    n = len(items)
+    if engine == 'dp':
+        return n * (objetivo + 1) <= DP_MAX_BITS
+    if engine == 'mitm':
+        return n <= MITM_MAX_ITEMS
+    return True
+
+
+def correr(items, objetivo, engine, workers, limite, medir_memoria):
+    solver = CombinacionSolver(items, _texto(objetivo), time_limit_seconds=limite, engine=engine, workers=workers,
+                               unidades=True)
+    inicio = time.perf_counter()
+    _, suma, _, time_exceeded = solver.find_combination()
+    segundos = time.perf_counter() - inicio
+    estadisticas = solver.estadisticas
+    pico = None
+    if medir_memoria:
+        # Segunda corrida aparte: tracemalloc hace más lenta la búsqueda y falsearía el tiempo.
+        solver = CombinacionSolver(items, _texto(objetivo), time_limit_seconds=limite, engine=engine, workers=workers,
+                                   unidades=True)
+        tracemalloc.start()
+        solver.find_combination()
+        pico = tracemalloc.get_traced_memory()[1] // 1024
+        tracemalloc.stop()
+    return {
+        'engine': solver.select_engine() if engine == 'auto' else engine,
+        'engine_pedido': engine,
+        'segundos': round(segundos, 4),
+        'nodos': estadisticas.nodos,
+        'podas_cota': estadisticas.podas_cota,
+        'podas_capacidad': estadisticas.podas_capacidad,
+        'profundidad': estadisticas.profundidad,
+        'primera_mejora': estadisticas.primera_mejora,
+        'ultima_mejora': estadisticas.ultima_mejora,
+        'pico_memoria_kb': pico,
+        'suma': dinero.parsear(suma),
+        'time_exceeded': time_exceeded,
+    }
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de los motores de CombinacionSolver.")
+    parser.add_argument('--semilla', type=int, default=2025)
+    parser.add_argument('--tamanos', default='20,40,160,400', help="cantidades de items, separadas por coma")
+    parser.add_argument('--engines', default='bnb,dp,mitm,auto')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--limite', type=float, default=10, help="segundos máximos por búsqueda")
+    parser.add_argument('--sin-memoria', action='store_true', help="no medir el pico de memoria")
+    parser.add_argument('--sin-ejemplo', action='store_true', help="no incluir uploads/Montos y remitos.xlsx")
+    parser.add_argument('--salida', default='bench_results.jsonl')
+    args = parser.parse_args()
+
+    tamanos = [int(t) for t in args.tamanos.split(',')]
+    engines = args.engines.split(',')
+    base = {'fecha': datetime.utcnow().isoformat(timespec='seconds'), 'commit': _commit_actual(),
+            'semilla': args.semilla, 'workers': args.workers, 'limite': args.limite}
+
+    print(f"{'escenario':<28}{'engine':<10}{'segundos':>10}{'nodos':>12}{'mem KB':>9}{'brecha':>10}")
+    with open(args.salida, 'a', encoding='utf-8') as salida:
+        for escenario, items, objetivo in escenarios(args.semilla, tamanos, not args.sin_ejemplo):
+            corridas = [correr(items, objetivo, e, args.workers, args.limite, not args.sin_memoria)
+                        for e in engines if aplicable(e, items, objetivo)]
+            # Si alguna corrida terminó sin agotar el tiempo, su suma es el óptimo probado.
+            probadas = [c['suma'] for c in corridas if not c['time_exceeded']]
+            mejor_conocida = max(probadas) if probadas else max(c['suma'] for c in corridas)
+            for corrida in corridas:
+                registro = dict(base, escenario=escenario, n=len(items), objetivo=objetivo,
+                                mejor_conocida=mejor_conocida, optimo_probado=bool(probadas),
+                                brecha=mejor_conocida - corrida['suma'], **corrida)
+                salida.write(json.dumps(registro) + '\n')
+                memoria = '-' if corrida['pico_memoria_kb'] is None else corrida['pico_memoria_kb']
+                engine = corrida['engine_pedido'] if corrida['engine_pedido'] == corrida['engine'] \
+                    else f"{corrida['engine_pedido']}>{corrida['engine']}"
+                print(f"{escenario:<28}{engine:<10}{corrida['segundos']:>10.3f}{corrida['nodos']:>12}"
+                      f"{memoria:>9}{registro['brecha']:>10}")
+    print(f"Resultados agregados a {args.salida}")
+
+
+if __name__ == '__main__':
+    main()
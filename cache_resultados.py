@@ -0,0 +1,106 @@
+# Contador/cache_resultados.py
+# Memoria de búsquedas ya resueltas: la misma planilla (por hash de contenido) contra el mismo
+# objetivo y motor (con su modo, ver CombinacionSolver.clave_cache) no vuelve a pagar la búsqueda. Primer nivel LRU en memoria del proceso y,
+# opcionalmente, un segundo nivel persistente en SQLite compartido entre procesos.
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class ResultadoCacheado:
+    # combinacion es una lista de [id, monto en texto]; suma también va como texto.
+    __slots__ = ('combinacion', 'suma', 'time_exceeded', 'time_limit')
+
+    def __init__(self, combinacion, suma, time_exceeded, time_limit):
+        self.combinacion = combinacion
+        self.suma = suma
+        self.time_exceeded = time_exceeded
+        self.time_limit = time_limit
+
+    def sirve_para(self, time_limit):
+        # Un resultado completo es el óptimo. Uno cortado por tiempo sólo se reusa si la nueva
+        # búsqueda no tendría más tiempo que la que lo produjo (no podría encontrar algo mejor).
+        return not self.time_exceeded or time_limit <= self.time_limit
+
+    def reemplaza_a(self, otro):
+        return otro is None or not self.time_exceeded or (otro.time_exceeded and self.time_limit >= otro.time_limit)
+
+
+class CacheResultados:
+    def __init__(self, capacidad=256, ruta_sqlite=None):
+        self.capacidad = capacidad
+        self.ruta_sqlite = ruta_sqlite
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        if ruta_sqlite:
+            with self._conectar() as conexion:
+                conexion.execute(
+                    "CREATE TABLE IF NOT EXISTS resultados ("
+                    " dataset TEXT NOT NULL, objetivo INTEGER NOT NULL, engine TEXT NOT NULL,"
+                    " time_limit REAL NOT NULL, time_exceeded INTEGER NOT NULL, valor TEXT NOT NULL,"
+                    " PRIMARY KEY (dataset, objetivo, engine))")
+
+    @contextmanager
+    def _conectar(self):
+        conexion = sqlite3.connect(self.ruta_sqlite, timeout=5)
+        try:
+            with conexion:  # commit al salir, rollback si hubo error
+                yield conexion
+        finally:
+            conexion.close()
+
+    def obtener(self, dataset, objetivo_centavos, engine, time_limit):
+        """ResultadoCacheado utilizable para esta búsqueda, o None."""
+        clave = (dataset, objetivo_centavos, engine)
+        with self._lock:
+            resultado = self._lru.get(clave)
+            if resultado is not None:
+                self._lru.move_to_end(clave)
+        if resultado is None and self.ruta_sqlite:
+            resultado = self._obtener_sqlite(clave)
+            if resultado is not None:
+                self._guardar_lru(clave, resultado)
+        if resultado is not None and resultado.sirve_para(time_limit):
+            return resultado
+        return None
+
+    def guardar(self, dataset, objetivo_centavos, engine, resultado):
+        clave = (dataset, objetivo_centavos, engine)
+        with self._lock:
+            if not resultado.reemplaza_a(self._lru.get(clave)):
+                return
+        self._guardar_lru(clave, resultado)
+        if self.ruta_sqlite:
+            self._guardar_sqlite(clave, resultado)
+
+    def _guardar_lru(self, clave, resultado):
+        with self._lock:
+            self._lru[clave] = resultado
+            self._lru.move_to_end(clave)
+            while len(self._lru) > self.capacidad:
+                self._lru.popitem(last=False)
+
+    def _obtener_sqlite(self, clave):
+        with self._conectar() as conexion:
+            fila = conexion.execute(
+                "SELECT valor, time_exceeded, time_limit FROM resultados"
+                " WHERE dataset = ? AND objetivo = ? AND engine = ?", clave).fetchone()
+        if fila is None:
+            return None
+        valor = json.loads(fila[0])
+        return ResultadoCacheado(valor['combinacion'], valor['suma'], bool(fila[1]), fila[2])
+
+    def _guardar_sqlite(self, clave, resultado):
+        valor = json.dumps({'combinacion': resultado.combinacion, 'suma': resultado.suma})
+        with self._conectar() as conexion:
+            # Sólo se pisa la fila existente si el nuevo resultado es al menos igual de bueno.
+            conexion.execute(
+                "INSERT INTO resultados (dataset, objetivo, engine, time_limit, time_exceeded, valor)"
+                " VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (dataset, objetivo, engine) DO UPDATE SET"
+                " time_limit = excluded.time_limit, time_exceeded = excluded.time_exceeded, valor = excluded.valor"
+                " WHERE resultados.time_exceeded = 1 AND (excluded.time_exceeded = 0"
+                " OR excluded.time_limit >= resultados.time_limit)",
+                clave + (resultado.time_limit, int(resultado.time_exceeded), valor))
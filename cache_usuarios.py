@@ -0,0 +1,80 @@
+# Contador/cache_usuarios.py
+# Caché de identidad para el user_loader de Flask-Login: cada request con @login_required
+# carga al usuario de la sesión, y sin esto cada una es una consulta a la base. Se guardan
+# los valores de las columnas (no la instancia) durante unos segundos por proceso, y en cada
+# request se arma una instancia nueva "detached", así ninguna request comparte el objeto con
+# otra ni con una sesión de SQLAlchemy ya cerrada.
+# Se invalida al cerrar sesión y cuando el usuario se modifica o borra por el ORM (por ejemplo,
+# al cambiar la contraseña). Con varios procesos, los demás pueden ver los datos viejos hasta
+# que venza el TTL.
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+# Todas las cachés vivas, para invalidarlas desde los eventos del ORM.
+_caches = weakref.WeakSet()
+_modelos_escuchados = set()
+
+
+def _invalidar_en_todas(mapper, conexion, usuario):
+    for cache in list(_caches):
+        if isinstance(usuario, cache.modelo):
+            cache.invalidar(usuario.id)
+
+
+class CacheUsuarios:
+    def __init__(self, modelo, ttl=30, capacidad=1024):
+        self.modelo = modelo
+        self.ttl = ttl
+        self.capacidad = capacidad
+        self._columnas = [atributo.key for atributo in inspect(modelo).column_attrs]
+        self._entradas = OrderedDict()  # id -> (vencimiento, {columna: valor})
+        self._lock = threading.Lock()
+        _caches.add(self)
+        if modelo not in _modelos_escuchados:
+            _modelos_escuchados.add(modelo)
+            event.listen(modelo, 'after_update', _invalidar_en_todas)
+            event.listen(modelo, 'after_delete', _invalidar_en_todas)
+
+    def obtener(self, user_id):
+        """Instancia detached del usuario si está en la caché y no venció, o None."""
+        with self._lock:
+            entrada = self._entradas.get(user_id)
+            if entrada is None:
+                return None
+            if entrada[0] < time.monotonic():
+                del self._entradas[user_id]
+                return None
+            self._entradas.move_to_end(user_id)
+            valores = entrada[1]
+        usuario = self.modelo(**valores)
+        # Queda como si se hubiera leído de la base: se puede usar con session.merge(load=False).
+        make_transient_to_detached(usuario)
+        return usuario
+
+    def guardar(self, usuario):
+        if self.ttl <= 0:
+            return
+        valores = {columna: getattr(usuario, columna) for columna in self._columnas}
+        with self._lock:
+            self._entradas[usuario.id] = (time.monotonic() + self.ttl, valores)
+            self._entradas.move_to_end(usuario.id)
+            while len(self._entradas) > self.capacidad:
+                self._entradas.popitem(last=False)
+
+    def invalidar(self, user_id):
+        with self._lock:
+            self._entradas.pop(user_id, None)
+
+    def cargar(self, session, user_id):
+        """El usuario desde la caché o, si no está, desde la base (y queda guardado)."""
+        usuario = self.obtener(user_id)
+        if usuario is None:
+            usuario = session.get(self.modelo, user_id)
+            if usuario is not None:
+                self.guardar(usuario)
+        return usuario
@@ -0,0 +1,264 @@
+# Contador/calculador_bp/routes.py
+# Rutas del calculador: carga de planillas, búsquedas (simples y en lote), resultados,
+# descargas y métricas. Los módulos pesados (pandas y openpyxl, vía ingesta/exportar, y el
+# solver) se importan recién cuando una request los necesita, así el arranque de cada worker
+# y las rutas de inicio y login no pagan su costo. precargar() los importa de antemano.
+import io
+import json
+import os
+import re
+import tempfile
+import time
+from decimal import Decimal
+
+from flask import Blueprint, render_template, request, redirect, url_for, session, abort, jsonify, flash, current_app, Response, send_file
+from flask_login import login_required, current_user
+
+import almacen
+import dinero
+import exportar
+import ingesta
+import metricas
+import trabajos
+from extensions import db
+from models import TrabajoCalculo
+
+calculador_bp = Blueprint('calculador', __name__)
+
+
+def precargar():
+    """Importa los módulos pesados del calculador. Con gunicorn --preload (CALCULADOR_PRECARGAR=1)
+    se importan una sola vez en el proceso maestro y los workers los heredan al hacer fork.
+    """
+    import openpyxl  # noqa: F401
+    import pandas  # noqa: F401
+    import solver  # noqa: F401
+
+
+@calculador_bp.route('/calculador', methods=['GET', 'POST'])
+@login_required 
+def calculador():
+    # ... (Tu lógica de la ruta /calculador) ...
+    titulo_actual = "Calculador: Comparador de Montos Excel" 
+    if request.method == 'POST':
+        if 'excel_file' in request.files:
+            file = request.files['excel_file']
+            if file.filename == '':
+                return render_template('calculador.html', error_excel="No se seleccionó ningún archivo.", titulo_pagina=titulo_actual)
+            if file and file.filename.lower().endswith(ingesta.EXTENSIONES):
+                try:
+                    # El archivo se vuelca a disco y se lee fila a fila desde ahí, sin cargarlo entero en memoria.
+                    extension = os.path.splitext(file.filename)[1].lower()
+                    inicio = time.perf_counter()
+                    with metricas.medir('calculador.ingesta'), tempfile.NamedTemporaryFile(suffix=extension) as temporal:
+                        file.save(temporal)
+                        temporal.flush()
+                        datos = ingesta.leer_archivo(temporal.name, escala=current_app.config['MONTO_ESCALA'])
+                    current_app.logger.info(f"Planilla '{file.filename}' leída: {len(datos)} filas en {time.perf_counter() - inicio:.2f}s.")
+                    if datos.omitidas:
+                        ejemplos = "; ".join(f"fila {fila} ({motivo}: '{valor}')" for fila, _, valor, motivo in datos.omitidas[:5])
+                        current_app.logger.warning(f"Omitiendo {len(datos.omitidas)} filas de '{file.filename}': {ejemplos}")
+                        flash(f"Se omitieron {len(datos.omitidas)} filas sin un monto válido. Por ejemplo: {ejemplos}.", 'warning')
+                    if not len(datos):
+                         return render_template('calculador.html', error_excel="No se encontraron datos válidos de ID y Monto.", titulo_pagina=titulo_actual)
+                    # En la sesión (cookie firmada) sólo va la clave; los datos quedan en el servidor.
+                    with metricas.medir('calculador.almacen'):
+                        session['dataset'] = almacen.guardar(datos.ids, datos.centavos, datos.escala); session['filename'] = file.filename
+                    return redirect(url_for('calculador.calculador')) 
+                except ingesta.ErrorIngesta as e:
+                    return render_template('calculador.html', error_excel=str(e), titulo_pagina=titulo_actual)
+                except Exception as e:
+                    current_app.logger.error(f"Error leyendo Excel: {e}", exc_info=True)
+                    return render_template('calculador.html', error_excel=f"Error al leer Excel: {e}", titulo_pagina=titulo_actual)
+            else:
+                return render_template('calculador.html', error_excel="Formato de archivo no válido.", titulo_pagina=titulo_actual)
+        elif 'monto_objetivo' in request.form and 'dataset' in session:
+            monto_objetivo_str = request.form['monto_objetivo']
+            modo = request.form.get('modo', 'menor_igual'); tolerancia = request.form.get('tolerancia') or '0'
+            alternativas = current_app.config['SOLVER_MAX_ALTERNATIVAS'] if 'alternativas' in request.form else 0
+            try:
+                from solver import CombinacionSolver  # Recién acá: el solver no se carga al arrancar
+                opciones = dict(time_limit_seconds=current_app.config['SOLVER_TIME_LIMIT'], engine=current_app.config['SOLVER_ENGINE'], workers=current_app.config['SOLVER_WORKERS'], modo=modo, tolerancia=tolerancia)
+                if not alternativas:
+                    # Primero la caché de resultados: la clave sale del formulario y de la escala de la
+                    # planilla (sólo su cabecera), sin cargarla ni armar el solver con sus items.
+                    escala = almacen.leer_escala(session['dataset'])
+                    if escala is not None:
+                        clave = CombinacionSolver((), monto_objetivo_str, escala=escala, **opciones)
+                        trabajo = trabajos.encolar_desde_cache(clave, current_user.id, session.get('filename'), session['dataset'])
+                        if trabajo is not None:
+                            return redirect(url_for('calculador.calculador_trabajo', trabajo_id=trabajo.id))
+                with metricas.medir('calculador.almacen'):
+                    dataset = almacen.cargar(session['dataset'])
+                if dataset is None:
+                    session.pop('dataset', None); session.pop('filename', None)
+                    return render_template('calculador.html', error_excel="Los datos cargados vencieron. Por favor, vuelve a cargar el archivo.", titulo_pagina=titulo_actual)
+                with metricas.medir('calculador.preparacion'):
+                    # Los montos pasan al solver como enteros, tal como están en el almacén.
+                    solver = CombinacionSolver(dataset.filas(), monto_objetivo_str, escala=dataset.escala, unidades=True, **opciones)
+                    # La búsqueda corre en segundo plano; la request sólo la encola.
+                    trabajo = trabajos.encolar(solver, current_user.id, session.get('filename'), dataset.clave, alternativas)
+                return redirect(url_for('calculador.calculador_trabajo', trabajo_id=trabajo.id))
+            except ValueError as e: 
+                 current_app.logger.error(f"Error en solver: {e}", exc_info=True)
+                 return render_template('calculador.html', excel_cargado=True,filename=session.get('filename'),error_monto=str(e), titulo_pagina=titulo_actual)
+            except Exception as e_general:
+                 current_app.logger.error(f"Error inesperado: {e_general}", exc_info=True)
+                 return render_template('calculador.html', excel_cargado=True,filename=session.get('filename'),error_monto=f"Error inesperado: {e_general}", titulo_pagina=titulo_actual)
+    excel_cargado = 'dataset' in session; filename = session.get('filename') if excel_cargado else None
+    with metricas.medir('calculador.render'):
+        return render_template('calculador.html', excel_cargado=excel_cargado, filename=filename, titulo_pagina=titulo_actual)
+
+@calculador_bp.route('/calculador/reset') 
+@login_required 
+def reset_calculador():
+    # Sólo se olvida la planilla de esta sesión: el archivo del almacén se identifica por su
+    # contenido y puede ser de otro usuario o de un trabajo anterior. Lo borra el TTL.
+    session.pop('dataset', None)
+    session.pop('filename', None)
+    return redirect(url_for('calculador.calculador')) 
+
+def _diferencia(resultado, escala):
+    # Objetivo - suma en unidades enteras de la escala.
+    return dinero.parsear(resultado['monto_objetivo'], escala) - dinero.parsear(resultado['suma'], escala)
+
+def _trabajo_del_usuario(trabajo_id):
+    trabajo = db.session.get(TrabajoCalculo, trabajo_id)
+    if trabajo is None or trabajo.user_id != current_user.id:
+        abort(404)
+    trabajos.marcar_si_abandonado(trabajo)
+    return trabajo
+
+@calculador_bp.route('/calculador/trabajo/<trabajo_id>')
+@login_required
+def calculador_trabajo(trabajo_id):
+    trabajo = _trabajo_del_usuario(trabajo_id)
+    resultado = json.loads(trabajo.resultado) if trabajo.resultado else None
+    escala = resultado.get('escala', dinero.ESCALA) if resultado else dinero.ESCALA
+    if trabajo.estado == 'terminado' and trabajo.tipo == 'lote':
+        for r in resultado['resultados']:
+            r['diferencia'] = dinero.formatear(_diferencia(r, escala), escala)
+        return render_template('calculador_lote_results.html', trabajo=trabajo, resultados=resultado['resultados'], sin_repetir=resultado['sin_repetir'], time_limit_config=resultado['time_limit'], aceptado=resultado['aceptado'], titulo_pagina="Resultados del Lote")
+    if trabajo.estado == 'terminado':
+        # Las combinaciones alternativas se muestran de a una página (?pagina=N).
+        alternativas = resultado.get('alternativas') or []
+        por_pagina = current_app.config['ALTERNATIVAS_POR_PAGINA']
+        paginas = max(1, -(-len(alternativas) // por_pagina))
+        pagina = min(max(request.args.get('pagina', 1, type=int), 1), paginas)
+        modo = resultado.get('modo', 'menor_igual')
+        diferencia = _diferencia(resultado, escala)
+        fuera_de_tolerancia = modo == 'tolerancia' and abs(diferencia) > dinero.parsear(resultado.get('tolerancia', '0'), escala)
+        with metricas.medir('calculador.render_resultados'):
+            return render_template('calculador_results.html', trabajo_id=trabajo.id, combinacion=[tuple(item) for item in resultado['combinacion']], suma_obtenida=resultado['suma'], monto_objetivo=resultado['monto_objetivo'], filename=trabajo.filename, time_exceeded=resultado['time_exceeded'], time_limit_config=resultado['time_limit'], aceptado=resultado['aceptado'], modo=modo, tolerancia=resultado.get('tolerancia', '0.00'), diferencia=dinero.formatear(diferencia, escala), fuera_de_tolerancia=fuera_de_tolerancia, alternativas=alternativas[(pagina - 1) * por_pagina:pagina * por_pagina], total_alternativas=len(alternativas), primera_alternativa=(pagina - 1) * por_pagina + 1, pagina=pagina, paginas=paginas, titulo_pagina="Resultados del Calculador")
+    if trabajo.estado == 'error':
+        # Sin planilla cargada el formulario del monto no se muestra: el error va junto al de carga.
+        error = f"Error inesperado: {trabajo.error}"
+        if 'dataset' not in session:
+            return render_template('calculador.html', error_excel=error, titulo_pagina="Calculador: Comparador de Montos Excel")
+        return render_template('calculador.html', excel_cargado=True, filename=session.get('filename'), error_monto=error, titulo_pagina="Calculador: Comparador de Montos Excel")
+    return render_template('calculador_trabajo.html', trabajo=trabajo, parcial=resultado, titulo_pagina="Buscando Combinación")
+
+@calculador_bp.route('/calculador/lote', methods=['POST'])
+@login_required
+def calculador_lote():
+    titulo_actual = "Calculador: Comparador de Montos Excel"
+    dataset = almacen.cargar(session['dataset']) if 'dataset' in session else None
+    if dataset is None:
+        session.pop('dataset', None); session.pop('filename', None)
+        return render_template('calculador.html', error_excel="Los datos cargados vencieron. Por favor, vuelve a cargar el archivo.", titulo_pagina=titulo_actual)
+    try:
+        # Los montos pueden venir escritos en el formulario (uno por línea) y/o en un archivo aparte.
+        montos_objetivo = [m for m in re.split(r'[\s;]+', request.form.get('montos_objetivo', '')) if m]
+        archivo = request.files.get('archivo_objetivos')
+        if archivo and archivo.filename:
+            extension = os.path.splitext(archivo.filename)[1].lower()
+            with tempfile.NamedTemporaryFile(suffix=extension) as temporal:
+                archivo.save(temporal)
+                temporal.flush()
+                montos_objetivo += ingesta.leer_objetivos(temporal.name)
+        from solver import LoteSolver
+        lote = LoteSolver(dataset.filas(), montos_objetivo, time_limit_seconds=current_app.config['SOLVER_TIME_LIMIT'], engine=current_app.config['SOLVER_ENGINE'], workers=current_app.config['SOLVER_WORKERS'], sin_repetir='sin_repetir' in request.form, escala=dataset.escala, unidades=True)
+        trabajo = trabajos.encolar_lote(lote, current_user.id, session.get('filename'), dataset.clave)
+        return redirect(url_for('calculador.calculador_trabajo', trabajo_id=trabajo.id))
+    except ValueError as e:
+        return render_template('calculador.html', excel_cargado=True, filename=session.get('filename'), error_lote=str(e), titulo_pagina=titulo_actual)
+    except Exception as e:
+        # Por ejemplo, un .xlsx dañado en el archivo de objetivos.
+        current_app.logger.error(f"Error leyendo objetivos del lote: {e}", exc_info=True)
+        return render_template('calculador.html', excel_cargado=True, filename=session.get('filename'), error_lote=f"Error al leer el archivo de objetivos: {e}", titulo_pagina=titulo_actual)
+
+@calculador_bp.route('/calculador/trabajo/<trabajo_id>/descargar')
+@login_required
+def calculador_trabajo_descargar(trabajo_id):
+    trabajo = _trabajo_del_usuario(trabajo_id)
+    if trabajo.tipo != 'lote' or trabajo.estado != 'terminado':
+        abort(404)
+    resultados = json.loads(trabajo.resultado)['resultados']
+    import openpyxl
+    libro = openpyxl.Workbook(write_only=True)
+    resumen = libro.create_sheet('Resumen')
+    resumen.append(['Monto Objetivo', 'Suma Obtenida', 'Diferencia', 'Comprobantes', 'Tiempo Agotado'])
+    detalle = libro.create_sheet('Detalle')
+    detalle.append(['Monto Objetivo', 'ID/Comprobante', 'Monto'])
+    for r in resultados:
+        objetivo = Decimal(r['monto_objetivo']); suma = Decimal(r['suma'])
+        resumen.append([objetivo, suma, objetivo - suma, len(r['combinacion']), 'Sí' if r['time_exceeded'] else 'No'])
+        for item_id, monto in r['combinacion']:
+            detalle.append([objetivo, item_id, Decimal(monto)])
+    contenido = io.BytesIO()
+    libro.save(contenido)
+    contenido.seek(0)
+    nombre = os.path.splitext(trabajo.filename or 'planilla')[0] + '_lote.xlsx'
+    return send_file(contenido, as_attachment=True, download_name=nombre, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
+@calculador_bp.route('/calculador/trabajo/<trabajo_id>/exportar.<formato>')
+@login_required
+def calculador_trabajo_exportar(trabajo_id, formato):
+    # Toda la planilla con la combinación marcada (o la alternativa ?alternativa=N), en CSV o XLSX.
+    trabajo = _trabajo_del_usuario(trabajo_id)
+    if trabajo.tipo == 'lote' or trabajo.estado != 'terminado' or formato not in exportar.FORMATOS:
+        abort(404)
+    resultado = json.loads(trabajo.resultado)
+    combinacion = resultado['combinacion']
+    alternativa = request.args.get('alternativa', type=int)
+    if alternativa is not None:
+        alternativas = resultado.get('alternativas') or []
+        if not 1 <= alternativa <= len(alternativas):
+            abort(404)
+        combinacion = alternativas[alternativa - 1]['combinacion']
+    dataset = almacen.cargar(trabajo.dataset) if trabajo.dataset else None
+    if dataset is None:
+        return render_template('calculador.html', excel_cargado='dataset' in session, filename=session.get('filename'), error_excel="Los datos de esa planilla vencieron. Por favor, vuelve a cargar el archivo.", titulo_pagina="Calculador: Comparador de Montos Excel")
+    # La respuesta se genera de a partes mientras se envía (ver exportar.py).
+    respuesta = Response(exportar.en_partes(formato, exportar.marcar(dataset, combinacion), dataset.escala), mimetype=exportar.FORMATOS[formato])
+    nombre = os.path.splitext(trabajo.filename or 'planilla')[0] + (f"_alternativa_{alternativa}" if alternativa else '') + f"_conciliacion.{formato}"
+    respuesta.headers.set('Content-Disposition', 'attachment', **exportar.opciones_adjunto(nombre))
+    return respuesta
+
+@calculador_bp.route('/calculador/trabajo/<trabajo_id>/estado')
+@login_required
+def calculador_trabajo_estado(trabajo_id):
+    trabajo = _trabajo_del_usuario(trabajo_id)
+    return jsonify({
+        'id': trabajo.id,
+        'estado': trabajo.estado,
+        'resultado': json.loads(trabajo.resultado) if trabajo.resultado else None,
+        'error': trabajo.error,
+        'creado': trabajo.creado.isoformat(),
+        'iniciado': trabajo.iniciado.isoformat() if trabajo.iniciado else None,
+        'terminado': trabajo.terminado.isoformat() if trabajo.terminado else None,
+    })
+
+@calculador_bp.route('/metrics')
+@login_required
+def metrics():
+    # Tiempos por fase y estadísticas de las últimas búsquedas de este proceso (ver metricas.py).
+    return jsonify(metricas.resumen())
+
+@calculador_bp.route('/calculador/trabajo/<trabajo_id>/aceptar', methods=['POST'])
+@login_required
+def calculador_trabajo_aceptar(trabajo_id):
+    trabajo = _trabajo_del_usuario(trabajo_id)
+    if not trabajo.finalizado:
+        trabajos.aceptar(trabajo)
+    return redirect(url_for('calculador.calculador_trabajo', trabajo_id=trabajo.id))
@@ -0,0 +1,50 @@
+# Contador/dinero.py
+# Montos como enteros de punto fijo: unidades de 10**-escala (con la escala por defecto,
+# centavos). Se validan y convierten una sola vez al leer la planilla; de ahí en más viajan
+# como int (planilla, almacén, solver) y sólo se vuelven texto o Decimal para mostrarlos.
+import re
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+ESCALA = 2
+
+_NUMERO = re.compile(r'\s*([+-]?)(\d*)(?:\.(\d*))?\s*$')
+
+
+def parsear(valor, escala=ESCALA, redondeo=ROUND_HALF_UP):
+    """Monto (texto, int, float o Decimal) en unidades de 10**-escala.
+
+    Los decimales que sobran se redondean con redondeo. ValueError si no es un número finito.
+    """
+    if isinstance(valor, bool):
+        raise ValueError(f"Monto no numérico: {valor!r}")
+    if isinstance(valor, int):
+        return valor * 10 ** escala
+    if isinstance(valor, float):
+        valor = repr(float(valor))  # El texto más corto que vuelve al mismo float: 44881.94, no 44881.9399...
+    if isinstance(valor, str):
+        numero = _NUMERO.match(valor)
+        if numero and (numero.group(2) or numero.group(3)) and len(numero.group(3) or '') <= escala:
+            # Caso común, sin Decimal: a lo sumo `escala` decimales, no hace falta redondear.
+            signo, enteros, decimales = numero.groups()
+            unidades = int(enteros or '0') * 10 ** escala + int((decimales or '').ljust(escala, '0') or '0')
+            return -unidades if signo == '-' else unidades
+    try:
+        decimal = valor if isinstance(valor, Decimal) else Decimal(str(valor).strip())
+        if not decimal.is_finite():
+            raise ValueError(f"Monto no numérico: {valor!r}")
+        return int(decimal.scaleb(escala).quantize(Decimal(1), rounding=redondeo))
+    except InvalidOperation:
+        raise ValueError(f"Monto no numérico: {valor!r}")
+
+
+def formatear(unidades, escala=ESCALA):
+    """Texto con `escala` decimales, sin separador de miles: -1234.50."""
+    if not escala:
+        return str(unidades)
+    signo = '-' if unidades < 0 else ''
+    enteros, resto = divmod(abs(unidades), 10 ** escala)
+    return f"{signo}{enteros}.{resto:0{escala}d}"
+
+
+def a_decimal(unidades, escala=ESCALA):
+    return Decimal(unidades).scaleb(-escala)
@@ -0,0 +1,101 @@
+# Contador/exportar.py
+# Exportación de una planilla con la combinación encontrada: todas las filas del dataset
+# guardado en el almacén, en su orden original, con una columna que marca las seleccionadas.
+# Las respuestas se generan de a partes (generadores), así una planilla de 100k filas no se
+# arma entera en memoria: el CSV sale a medida que se escribe y el XLSX usa el modo
+# write-only de openpyxl, que vuelca las filas a un temporal en disco (openpyxl se importa
+# recién al exportar un XLSX).
+import csv
+import io
+import tempfile
+import unicodedata
+from collections import Counter
+from urllib.parse import quote
+
+import dinero
+
+# Formato -> mimetype.
+FORMATOS = {
+    'csv': 'text/csv',  # Flask agrega charset=utf-8
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+# Mismos nombres de columna que reconoce ingesta.py: el archivo exportado se puede volver a cargar.
+ENCABEZADO = ('ID', 'Monto', 'Seleccionado')
+MARCAS = {True: 'Sí', False: 'No'}
+# Filas de CSV por parte y bytes por parte al enviar el XLSX.
+FILAS_POR_PARTE = 2000
+BYTES_POR_PARTE = 1 << 16
+
+
+def marcar(dataset, combinacion):
+    """(id, monto, seleccionado) por cada fila del dataset, con el monto entero en su escala.
+
+    combinacion es la lista [id, monto en texto] del resultado. Si hay filas repetidas (mismo
+    ID y monto), se marcan tantas como aparezcan en la combinación, empezando por la primera.
+    """
+    pendientes = Counter((item_id, dinero.parsear(monto, dataset.escala)) for item_id, monto in combinacion)
+    for item_id, unidades in zip(dataset.ids, dataset.centavos):
+        clave = (item_id, unidades)
+        seleccionado = pendientes[clave] > 0
+        if seleccionado:
+            pendientes[clave] -= 1
+        yield item_id, unidades, seleccionado
+
+
+def opciones_adjunto(nombre):
+    """Parámetros de Content-Disposition para descargar como `nombre`, que puede no ser ASCII
+    (mismo criterio que flask.send_file: filename en ASCII y filename* en UTF-8).
+    """
+    try:
+        nombre.encode('ascii')
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', nombre).encode('ascii', 'ignore').decode('ascii')
+        return {'filename': simple, 'filename*': f"UTF-8''{quote(nombre, safe='')}"}
+    return {'filename': nombre}
+
+
+def en_partes(formato, filas, escala):
+    """Generador de bytes del archivo en el formato pedido ('csv' o 'xlsx')."""
+    if formato == 'csv':
+        return csv_en_partes(filas, escala)
+    if formato == 'xlsx':
+        return xlsx_en_partes(filas, escala)
+    raise ValueError(f"Formato de exportación desconocido: {formato}")
+
+
+def csv_en_partes(filas, escala):
+    buffer = io.StringIO()
+    buffer.write('\ufeff')  # BOM: Excel abre el CSV como UTF-8 (ingesta.py lo lee con utf-8-sig).
+    escritor = csv.writer(buffer)
+    escritor.writerow(ENCABEZADO)
+    for numero, (item_id, unidades, seleccionado) in enumerate(filas, start=1):
+        escritor.writerow((item_id, dinero.formatear(unidades, escala), MARCAS[seleccionado]))
+        if numero % FILAS_POR_PARTE == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def xlsx_en_partes(filas, escala):
+    # Un .xlsx es un zip: recién se puede enviar cuando el libro está completo. Hasta entonces
+    # las filas quedan en el temporal de openpyxl, no en memoria.
+    import openpyxl
+    from openpyxl.cell import WriteOnlyCell
+
+    libro = openpyxl.Workbook(write_only=True)
+    hoja = libro.create_sheet('Conciliación')
+    hoja.append(ENCABEZADO)
+    formato_monto = '0.' + '0' * escala if escala else '0'
+    for item_id, unidades, seleccionado in filas:
+        monto = WriteOnlyCell(hoja, dinero.a_decimal(unidades, escala))
+        monto.number_format = formato_monto
+        hoja.append((item_id, monto, MARCAS[seleccionado]))
+    with tempfile.TemporaryFile() as archivo:
+        libro.save(archivo)
+        archivo.seek(0)
+        while True:
+            parte = archivo.read(BYTES_POR_PARTE)
+            if not parte:
+                break
+            yield parte
@@ -0,0 +1,237 @@
+# Contador/ingesta.py
+# Lectura de las planillas que se suben al calculador: detecta las columnas de ID y Monto,
+# lee sólo esas dos y convierte los montos a enteros de punto fijo (ver dinero.py), que es
+# como viajan después por el almacén y el solver.
+# .xlsx y .csv se leen fila a fila desde el archivo en disco (memoria acotada sin importar
+# el tamaño); .xls pasa por pandas, convirtiendo las columnas enteras de una vez.
+# openpyxl y pandas se importan recién al leer una planilla: importar este módulo es liviano.
+import codecs
+import csv
+import os
+from array import array
+from contextlib import contextmanager
+from functools import partial
+from itertools import chain
+
+import dinero
+
+EXTENSIONES = ('.xlsx', '.xls', '.csv')
+
+COLUMNAS_ID = frozenset(c.lower() for c in ['ID', 'Comprobante', 'Numero', 'Número'])
+COLUMNAS_MONTO = frozenset(c.lower() for c in ['Monto', 'Importe', 'Valor', 'Total'])
+# Codificaciones que se prueban en los CSV, en orden: UTF-8 (con o sin BOM) y la de los CSV que
+# exporta Excel en español. latin-1 decodifica cualquier archivo y queda como último recurso.
+CODIFICACIONES_CSV = ('utf-8-sig', 'cp1252')
+
+
+class ErrorIngesta(ValueError):
+    pass
+
+
+class DatosPlanilla:
+    # ids (lista de str) y centavos (array('q')) son paralelos; los centavos son unidades de
+    # 10**-escala (centavos con la escala por defecto). omitidas es una lista de
+    # (fila, id, valor, motivo), donde fila es el número de fila en la planilla (el
+    # encabezado es la fila 1).
+    __slots__ = ('ids', 'centavos', 'omitidas', 'columna_id', 'columna_monto', 'escala')
+
+    def __init__(self, ids, centavos, omitidas, columna_id, columna_monto, escala=dinero.ESCALA):
+        self.ids = ids
+        self.centavos = centavos
+        self.omitidas = omitidas
+        self.columna_id = columna_id
+        self.columna_monto = columna_monto
+        self.escala = escala
+
+    def __len__(self):
+        return len(self.ids)
+
+    def como_lista(self):
+        """Filas [id, monto] con el monto como texto con `escala` decimales."""
+        return [[item_id, dinero.formatear(c, self.escala)] for item_id, c in zip(self.ids, self.centavos)]
+
+
+def detectar_columnas(columnas):
+    """Primera columna de ID y primera de Monto reconocidas (sin distinguir mayúsculas)."""
+    columna_id = columna_monto = None
+    for columna in columnas:
+        nombre = str(columna).strip().lower()
+        if columna_id is None and nombre in COLUMNAS_ID:
+            columna_id = columna
+        elif columna_monto is None and nombre in COLUMNAS_MONTO:
+            columna_monto = columna
+        if columna_id is not None and columna_monto is not None:
+            return columna_id, columna_monto
+    raise ErrorIngesta("Columnas ID/Monto no encontradas. Cols: " + ", ".join(str(c) for c in columnas))
+
+
+def leer_archivo(ruta, filename=None, escala=dinero.ESCALA):
+    """Lee la planilla guardada en ruta según la extensión de filename (o de la ruta), con
+    los montos en unidades de 10**-escala.
+    """
+    extension = os.path.splitext(filename or ruta)[1].lower()
+    if extension == '.csv':
+        return leer_csv(ruta, escala)
+    if extension == '.xlsx':
+        return leer_xlsx(ruta, escala)
+    if extension == '.xls':
+        return leer_excel(ruta, escala)
+    raise ErrorIngesta("Formato de archivo no válido.")
+
+
+def _codificacion_csv(ruta):
+    # Se decodifica el archivo entero de a bloques (sin guardarlo): un error de UTF-8 puede
+    # aparecer recién en la última fila.
+    for codificacion in CODIFICACIONES_CSV:
+        decodificador = codecs.getincrementaldecoder(codificacion)()
+        try:
+            with open(ruta, 'rb') as archivo:
+                for bloque in iter(partial(archivo.read, 1 << 20), b''):
+                    decodificador.decode(bloque)
+                decodificador.decode(b'', final=True)
+            return codificacion
+        except UnicodeDecodeError:
+            continue
+    return 'latin-1'
+
+
+def _sobran_columnas(valores, ancho):
+    # Valores no vacíos más allá de las `ancho` columnas del encabezado: la fila está corrida
+    # (por ejemplo, un monto con coma decimal en un CSV separado por comas).
+    return len(valores) > ancho and any(v is not None and v != '' for v in valores[ancho:])
+
+
+@contextmanager
+def _abrir_filas(ruta, extension):
+    """Iterador de filas (tuplas de valores) de un .xlsx o .csv, leídas de a una desde disco."""
+    if extension == '.xlsx':
+        import openpyxl
+        # read_only: la hoja se recorre sin cargar el libro en memoria.
+        libro = openpyxl.load_workbook(ruta, read_only=True, data_only=True)
+        try:
+            yield libro.active.iter_rows(values_only=True)
+        finally:
+            libro.close()
+    elif extension == '.csv':
+        with open(ruta, newline='', encoding=_codificacion_csv(ruta)) as archivo:
+            muestra = archivo.read(4096)
+            archivo.seek(0)
+            try:
+                dialecto = csv.Sniffer().sniff(muestra, delimiters=',;\t|')
+            except csv.Error:
+                dialecto = csv.excel
+            yield csv.reader(archivo, dialecto)
+    else:
+        raise ErrorIngesta("Formato de archivo no válido.")
+
+
+def leer_xlsx(ruta, escala=dinero.ESCALA):
+    """Lee la primera hoja de un .xlsx en modo read-only, sin cargar el libro en memoria."""
+    with _abrir_filas(ruta, '.xlsx') as filas:
+        return _leer_filas(filas, escala)
+
+
+def leer_csv(ruta, escala=dinero.ESCALA):
+    with _abrir_filas(ruta, '.csv') as filas:
+        return _leer_filas(filas, escala)
+
+
+def _es_monto(valor):
+    try:
+        dinero.parsear(valor)
+    except ValueError:
+        return False
+    return True
+
+
+def leer_objetivos(ruta, filename=None):
+    """Montos objetivo (como texto) de un .xlsx o .csv: la columna de Monto o, si no hay
+    ninguna reconocible, la primera columna. La primera fila es encabezado sólo si nombra
+    una columna de Monto o si no es un número; si no, es el primer monto de la lista.
+    """
+    extension = os.path.splitext(filename or ruta)[1].lower()
+    with _abrir_filas(ruta, extension) as filas:
+        primera = tuple(next(filas, None) or ())
+        posicion = next((i for i, columna in enumerate(primera)
+                         if str(columna).strip().lower() in COLUMNAS_MONTO), None)
+        encabezado = posicion is not None or not primera or not _es_monto(primera[0])
+        posicion = posicion or 0
+        montos = []
+        for fila, valores in enumerate(filas if encabezado else chain([primera], filas), start=2 if encabezado else 1):
+            if _sobran_columnas(valores, len(primera)):
+                raise ErrorIngesta(f"La fila {fila} del archivo de objetivos tiene más columnas que la primera "
+                                   f"({', '.join(str(v) for v in valores)}). ¿Los montos usan coma decimal?")
+            if len(valores) > posicion and valores[posicion] not in (None, ''):
+                montos.append(str(valores[posicion]).strip())
+    if not montos:
+        raise ErrorIngesta("El archivo no tiene montos objetivo.")
+    return montos
+
+
+def _leer_filas(filas, escala):
+    encabezado = next(filas, None)
+    if encabezado is None:
+        raise ErrorIngesta("El archivo está vacío.")
+    columnas = [c for c in encabezado if c is not None]
+    columna_id, columna_monto = detectar_columnas(columnas)
+    pos_id = encabezado.index(columna_id)
+    pos_monto = encabezado.index(columna_monto)
+    ultima = max(pos_id, pos_monto)
+
+    ids = []
+    centavos = array('q')
+    omitidas = []
+    for fila, valores in enumerate(filas, start=2):
+        if _sobran_columnas(valores, len(encabezado)):
+            item_id = valores[pos_id]
+            omitidas.append((fila, '' if item_id is None else str(item_id), valores[pos_monto], 'columnas de más'))
+            continue
+        if len(valores) <= ultima:
+            valores = tuple(valores) + (None,) * (ultima + 1 - len(valores))
+        item_id, valor = valores[pos_id], valores[pos_monto]
+        if valor is None or valor == '':
+            if item_id is not None and item_id != '':
+                omitidas.append((fila, str(item_id), valor, 'monto vacío'))
+            continue  # Las filas en blanco al final de la hoja se ignoran sin avisar.
+        try:
+            # Texto y números de la celda se convierten sin pasar por float * 100.
+            monto = dinero.parsear(valor, escala)
+        except ValueError:
+            monto = None
+        if monto is None or not -2 ** 63 < monto < 2 ** 63:
+            omitidas.append((fila, '' if item_id is None else str(item_id), valor, 'monto no numérico'))
+            continue
+        ids.append('' if item_id is None else str(item_id))
+        centavos.append(monto)
+    return DatosPlanilla(ids, centavos, omitidas, columna_id, columna_monto, escala)
+
+
+def leer_excel(archivo, escala=dinero.ESCALA):
+    """Lee una planilla con pandas (ruta o archivo binario) y devuelve DatosPlanilla."""
+    import pandas as pd
+    columnas = pd.read_excel(archivo, nrows=0).columns
+    columna_id, columna_monto = detectar_columnas(columnas)
+    if hasattr(archivo, 'seek'):
+        archivo.seek(0)
+    df = pd.read_excel(archivo, usecols=[columna_id, columna_monto], dtype={columna_id: str})
+    return _convertir(df[columna_id], df[columna_monto], columna_id, columna_monto, escala)
+
+
+def _convertir(serie_id, serie_monto, columna_id, columna_monto, escala):
+    import pandas as pd
+    ids = serie_id.fillna('').astype(str)
+    montos = pd.to_numeric(serie_monto, errors='coerce')
+    # Unidades redondeadas: 44881.94 * 100 da 4488193.9999..., no hay que truncar.
+    centavos = (montos * 10 ** escala).round()
+    validas = centavos.abs() < 2 ** 63  # también descarta NaN e infinitos
+
+    omitidas = []
+    if not validas.all():
+        invalidas = ~validas
+        motivos = serie_monto[invalidas].isna().map({True: 'monto vacío', False: 'monto no numérico'})
+        for fila, item_id, valor, motivo in zip(serie_monto.index[invalidas], ids[invalidas],
+                                                serie_monto[invalidas], motivos):
+            omitidas.append((int(fila) + 2, item_id, valor, motivo))
+
+    return DatosPlanilla(ids[validas].tolist(), array('q', centavos[validas].astype('int64').tolist()),
+                         omitidas, columna_id, columna_monto, escala)
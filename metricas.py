@@ -0,0 +1,64 @@
+# Contador/metricas.py
+# Métricas del calculador en memoria del proceso: tiempos por fase de las requests (lectura
+# de la planilla, armado de la búsqueda, render) y estadísticas de las últimas búsquedas.
+# Con varios workers de gunicorn cada uno lleva las suyas; /metrics muestra las del que responde.
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Cuántas búsquedas recientes se conservan con sus estadísticas completas.
+BUSQUEDAS_RECIENTES = 50
+
+_lock = threading.Lock()
+_fases = {}  # nombre -> [cantidad, segundos totales, segundos máximos]
+_busquedas = deque(maxlen=BUSQUEDAS_RECIENTES)
+_totales = {'busquedas': 0, 'tiempo_agotado': 0, 'nodos': 0}
+
+
+def registrar_fase(nombre, segundos):
+    with _lock:
+        fase = _fases.setdefault(nombre, [0, 0.0, 0.0])
+        fase[0] += 1
+        fase[1] += segundos
+        fase[2] = max(fase[2], segundos)
+
+
+@contextmanager
+def medir(nombre):
+    """Registra cuánto tarda el bloque bajo la fase `nombre` (aunque termine con excepción)."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar_fase(nombre, time.perf_counter() - inicio)
+
+
+def registrar_busqueda(estadisticas, **datos):
+    """Guarda las estadísticas de una búsqueda (EstadisticasBusqueda.como_dict() más datos extra)."""
+    registro = dict(estadisticas, **datos)
+    with _lock:
+        _busquedas.append(registro)
+        _totales['busquedas'] += 1
+        _totales['nodos'] += registro.get('nodos') or 0
+        if registro.get('time_exceeded'):
+            _totales['tiempo_agotado'] += 1
+
+
+def resumen():
+    with _lock:
+        return {
+            'fases': {nombre: {'cantidad': cantidad, 'segundos_total': round(total, 4),
+                               'segundos_promedio': round(total / cantidad, 4), 'segundos_max': round(maximo, 4)}
+                      for nombre, (cantidad, total, maximo) in _fases.items()},
+            'busquedas': dict(_totales),
+            'busquedas_recientes': list(_busquedas),
+        }
+
+
+def reiniciar():
+    with _lock:
+        _fases.clear()
+        _busquedas.clear()
+        for clave in _totales:
+            _totales[clave] = 0
@@ -1,3 +1,4 @@
+from datetime import datetime
 from extensions import db
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -15,4 +16,31 @@ class User(UserMixin, db.Model):
         return check_password_hash(self.password_hash, password)
 
     def __repr__(self):
-        return f'<User {self.username}>'
\ No newline at end of file
+        return f'<User {self.username}>'
+
+class TrabajoCalculo(db.Model):
+    # Una búsqueda del calculador ejecutada en segundo plano (ver trabajos.py).
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    estado = db.Column(db.String(20), nullable=False, default='pendiente')  # pendiente, en_proceso, terminado, error
+    tipo = db.Column(db.String(10), nullable=False, default='simple')  # simple (un objetivo) o lote
+    filename = db.Column(db.String(255))
+    dataset = db.Column(db.String(64))  # clave de la planilla en almacen.py
+    monto_objetivo = db.Column(db.String(40))  # vacío en los lotes: cada objetivo va en el resultado
+    resultado = db.Column(db.Text)  # JSON con la mejor combinación (parcial mientras está en_proceso)
+    error = db.Column(db.Text)
+    creado = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    iniciado = db.Column(db.DateTime)
+    terminado = db.Column(db.DateTime)
+    # Pedido de cortar la búsqueda y quedarse con lo mejor hasta ahora. Va en la base porque el
+    # proceso que recibe el pedido no suele ser el que ejecuta el trabajo.
+    aceptar_pedido = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    # Última señal de vida del proceso que tiene el trabajo (en cola o en proceso).
+    latido = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @property
+    def finalizado(self):
+        return self.estado in ('terminado', 'error')
+
+    def __repr__(self):
+        return f'<TrabajoCalculo {self.id} {self.estado}>'
@@ -0,0 +1,960 @@
+# Contador/solver.py
+# Motores de búsqueda para el calculador: dada una lista de (ID, Monto) y un
+# monto objetivo, encuentran la combinación de montos cuya suma es la mayor
+# posible sin exceder el objetivo (o, según el modo, la menor que no baja del
+# objetivo o la más cercana dentro de una tolerancia).
+import multiprocessing
+import time
+from bisect import bisect_right
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from decimal import Decimal, InvalidOperation, ROUND_CEILING, ROUND_FLOOR
+from math import gcd
+
+import dinero
+
+# Motores disponibles. 'auto' elige según cantidad de items y tamaño del objetivo.
+ENGINES = ('auto', 'bnb', 'dp', 'mitm')
+# Qué combinación se busca: la mayor suma <= objetivo, la menor >= objetivo, o la más
+# cercana al objetivo sin pasarse de objetivo + tolerancia.
+MODOS = ('menor_igual', 'mayor_igual', 'tolerancia')
+
+# Límite de memoria para la tabla de sumas alcanzables del motor 'dp':
+# una fila de (objetivo + 1) bits por item (2**28 bits = 32 MiB).
+DP_MAX_BITS = 1 << 28
+# Meet-in-the-middle enumera 2**(n/2) sumas por mitad: con 36 items son ~33 MiB y un par de
+# segundos en el peor caso; con 40 ya pasa de 130 MiB. Más allá, 'bnb' con sus cotas.
+MITM_MAX_ITEMS = 36
+# 'auto' sólo prefiere 'mitm' cuando el espacio de 'bnb' (combinaciones por cubo: el producto
+# de cantidad + 1) supera por este factor a las 2**(n/2) sumas por mitad de 'mitm'. Con pocos
+# montos distintos 'bnb' recorre muy poco y 'mitm' pagaría igual sus 2**(n/2).
+MITM_VENTAJA_MIN = 1 << 10
+# Cada cuántas iteraciones se consulta el reloj dentro de los bucles largos.
+_CHEQUEO_TIEMPO = 4096
+# En modo paralelo se generan al menos workers * esto subárboles, para repartir carga.
+SUBPROBLEMAS_POR_PROCESO = 8
+# Segundos entre consultas a detener() mientras se espera a los procesos.
+_ESPERA_PROCESOS = 0.25
+# Tablas de sumas alcanzables de la cola (últimos cubos, los de montos chicos) que usa 'bnb':
+# ninguna tabla pasa de COLA_MAX_BITS bits y entre todas no pasan de COLA_TOTAL_BITS (2 MiB).
+COLA_MAX_BITS = 1 << 18
+COLA_TOTAL_BITS = 1 << 24
+
+# Combinación parcial reportada durante la búsqueda: misma forma que find_combination()
+# (lista de (id, monto) y suma en Decimal) más segundos transcurridos y nodos explorados.
+Mejora = namedtuple('Mejora', ['combinacion', 'suma', 'elapsed', 'nodos'])
+# Combinación generada por CombinacionSolver.iter_combinaciones().
+Alternativa = namedtuple('Alternativa', ['combinacion', 'suma'])
+
+
+def _valor(suma, centro):
+    # Puntaje de una suma: mayor cuanto más cerca del centro. Si el centro es la capacidad
+    # (modo 'menor_igual') es la suma misma.
+    return suma if suma <= centro else 2 * centro - suma
+
+
+def _piso(capacidad, centro):
+    # Puntaje menor que el de cualquier suma entre 1 y capacidad: los motores parten de acá y
+    # nunca proponen la combinación vacía. En 'tolerancia' una suma que se pasa del centro en más
+    # que el centro mismo vale menos que 0, y aun así es mejor que no elegir nada.
+    return min(0, 2 * centro - capacidad) - 1
+
+
+def _mas_cercano(tabla, deseado, tope):
+    """Suma alcanzable según la tabla, <= tope, más cercana a deseado (ante empate, la menor).
+    -1 si ninguna suma de la tabla llega a tope.
+    """
+    if deseado >= tope:
+        return (tabla & ((2 << tope) - 1)).bit_length() - 1
+    if deseado <= 0:
+        tabla &= (2 << tope) - 1
+        return (tabla & -tabla).bit_length() - 1
+    debajo = (tabla & ((2 << deseado) - 1)).bit_length() - 1
+    encima = (tabla >> (deseado + 1)) & ((1 << (tope - deseado)) - 1)
+    if encima:
+        arriba = deseado + (encima & -encima).bit_length()
+        if debajo < 0 or arriba - deseado < deseado - debajo:
+            return arriba
+    return debajo
+
+
+def _tablas_cola(montos, cantidades, resto):
+    """Sumas alcanzables (bitsets) usando sólo los cubos b, b+1, ... del final.
+
+    Devuelve (cola, tablas) con tablas[b - cola] para cola <= b <= len(montos); la última es
+    siempre 1 (sólo la suma vacía). Cada tabla tiene resto[b] + 1 bits, así que la cola abarca
+    los cubos de montos más chicos hasta llegar a COLA_MAX_BITS / COLA_TOTAL_BITS.
+    """
+    tablas = [1]
+    total = 1
+    cola = len(montos)
+    while cola > 0 and resto[cola - 1] < COLA_MAX_BITS and total + resto[cola - 1] < COLA_TOTAL_BITS:
+        cola -= 1
+        alcanzables = tablas[-1]
+        # k = 0..cantidad items del cubo, partiendo la cantidad en 1, 2, 4, ... (log pasos).
+        pendientes, parte = cantidades[cola], 1
+        while pendientes:
+            parte = min(parte, pendientes)
+            alcanzables |= alcanzables << (parte * montos[cola])
+            pendientes -= parte
+            parte *= 2
+        tablas.append(alcanzables)
+        total += resto[cola] + 1
+    tablas.reverse()
+    return cola, tablas
+
+
+def _completar_cola(montos, cantidades, inicios, cola, tablas, nivel, falta):
+    """Máscara de items de los cubos nivel, nivel+1, ... que suman exactamente falta."""
+    mascara = 0
+    for b in range(nivel, len(montos)):
+        siguiente = tablas[b + 1 - cola]
+        k = min(cantidades[b], falta // montos[b])
+        while not (siguiente >> (falta - k * montos[b])) & 1:
+            k -= 1
+        mascara |= ((1 << k) - 1) << inicios[b]
+        falta -= k * montos[b]
+    return mascara
+
+
+def _ramificar(montos, cantidades, inicios, resto, objetivo, prefijo=(), contador=None,
+               detener=None, cota_externa=None, mcd=None, cola=None, tablas=None, centro=None, meta=None):
+    """Ramificación y poda sobre cubos (ver CombinacionSolver._agrupar_cubos).
+
+    Genera (suma, mascara) en cada mejora. prefijo fija cuántos items se toman de los primeros
+    cubos; contador recibe [nodos, podas por cota, podas por capacidad, profundidad máxima]
+    (ver EstadisticasBusqueda); detener() se consulta cada _CHEQUEO_TIEMPO nodos, igual que
+    cota_externa(), una suma ya lograda en otro lado que no tiene sentido dejar de igualar.
+    mcd[b] es el MCD de los montos desde el cubo b; cola y tablas salen de _tablas_cola().
+    Ninguna suma pasa de objetivo; entre ellas se busca la de mayor _valor() respecto de centro
+    (por defecto el mismo objetivo) y se termina al llegar a meta, el mejor valor posible. La
+    combinación vacía no se genera nunca.
+    """
+    num_cubos = len(montos)
+    base = len(prefijo)
+    if mcd is None:
+        mcd = [1] * num_cubos
+    if cola is None:
+        cola, tablas = num_cubos, [1]
+    if centro is None:
+        centro = objetivo
+    if meta is None:
+        meta = centro
+    minimo = montos[-1] if montos else 0  # Los cubos van de mayor a menor monto.
+    # La pila explícita es tomados[0..nivel): cuántos items de cada cubo lleva la rama actual.
+    # Cada cubo se prueba con k = máximo posible, k - 1, ..., 0 items.
+    tomados = list(prefijo) + [0] * (num_cubos - base)
+    suma = 0
+    mascara = 0
+    for b, k in enumerate(prefijo):
+        suma += k * montos[b]
+        mascara |= ((1 << k) - 1) << inicios[b]
+    nivel = base
+    mejor = cota = _piso(objetivo, centro)
+    nodos = podas_cota = podas_capacidad = 0
+    profundidad = base
+    while True:
+        nodos += 1
+        if nodos % _CHEQUEO_TIEMPO == 0:
+            if contador is not None:
+                contador[:] = (nodos, podas_cota, podas_capacidad, profundidad)
+            if detener is not None and detener():
+                break
+            if cota_externa is not None:
+                cota = cota_externa()
+        valor = suma if suma <= centro else 2 * centro - suma
+        if valor > mejor and suma:
+            mejor = valor
+            if contador is not None:
+                contador[:] = (nodos, podas_cota, podas_capacidad, profundidad)
+            yield suma, mascara
+            if mejor == meta:
+                break
+        if nivel < num_cubos:
+            # Cota: lo que queda entra entero o, si no, a lo sumo se llena la holgura en múltiplos
+            # del MCD de los montos restantes (y nada si ni el monto más chico entra).
+            tope = resto[nivel]
+            holgura = objetivo - suma
+            if holgura < tope:
+                tope = holgura - holgura % mcd[nivel] if holgura >= minimo else 0
+            # Mejor valor posible en la rama, con sumas entre suma y suma + tope.
+            if suma + tope <= centro:
+                valor = suma + tope
+            else:
+                valor = centro if suma <= centro else 2 * centro - suma
+            if valor <= mejor or valor < cota:
+                podas_cota += 1
+            elif nivel >= cola:
+                # En la cola la mejor forma de completar sale directo de su tabla.
+                if tope == resto[nivel] and centro - suma >= tope:
+                    falta = tope
+                else:
+                    # Sin nada tomado todavía, completar con nada no cuenta.
+                    tabla = tablas[nivel - cola] if suma else tablas[nivel - cola] & ~1
+                    falta = _mas_cercano(tabla, centro - suma, tope)
+                valor = _valor(suma + falta, centro)
+                if falta >= 0 and valor > mejor:
+                    mejor = valor
+                    if contador is not None:
+                        contador[:] = (nodos, podas_cota, podas_capacidad, profundidad)
+                    yield suma + falta, mascara | _completar_cola(montos, cantidades, inicios, cola, tablas, nivel, falta)
+                    if mejor == meta:
+                        break
+            else:
+                # Descender: tomar del cubo actual tantos items como entren.
+                monto = montos[nivel]
+                k = holgura // monto
+                if k < cantidades[nivel]:
+                    podas_capacidad += 1  # No entran todos: las ramas con más items ni se generan.
+                else:
+                    k = cantidades[nivel]
+                tomados[nivel] = k
+                suma += k * monto
+                mascara |= ((1 << k) - 1) << inicios[nivel]
+                nivel += 1
+                if nivel > profundidad:
+                    profundidad = nivel
+                continue
+        # Retroceder hasta el cubo más profundo al que todavía se le puede quitar un item.
+        nivel -= 1
+        while nivel >= base and tomados[nivel] == 0:
+            nivel -= 1
+        if nivel < base:
+            break
+        k = tomados[nivel] - 1
+        tomados[nivel] = k
+        suma -= montos[nivel]
+        mascara ^= 1 << (inicios[nivel] + k)
+        nivel += 1
+    if contador is not None:
+        contador[:] = (nodos, podas_cota, podas_capacidad, profundidad)
+
+
+# Estado de cada proceso del pool paralelo, cargado una vez por _iniciar_proceso.
+_proceso = {}
+
+
+def _iniciar_proceso(montos, cantidades, inicios, resto, mcd, cola, tablas, limites, deadline, cota, exacto):
+    # limites: (capacidad, centro, meta) de CombinacionSolver._limites().
+    _proceso.update(montos=montos, cantidades=cantidades, inicios=inicios, resto=resto, mcd=mcd,
+                    cola=cola, tablas=tablas, limites=limites, deadline=deadline, cota=cota, exacto=exacto)
+
+
+def _resolver_subproblema(seq, prefijo):
+    p = _proceso
+    cota, exacto, deadline = p['cota'], p['exacto'], p['deadline']
+    agotado = []
+
+    def detener():
+        # Un subárbol anterior ya alcanzó el objetivo exacto: éste no puede ganarle.
+        if exacto.value < seq:
+            return True
+        if time.time() > deadline:
+            agotado.append(True)
+            return True
+        return False
+
+    capacidad, centro, meta = p['limites']
+    mejor, mejor_suma, mejor_mascara = _piso(capacidad, centro), 0, 0
+    contador = [0, 0, 0, len(prefijo)]
+    if not detener():
+        for mejor_suma, mejor_mascara in _ramificar(p['montos'], p['cantidades'], p['inicios'], p['resto'],
+                                                    capacidad, prefijo, contador, detener, lambda: cota.value,
+                                                    p['mcd'], p['cola'], p['tablas'], centro, meta):
+            mejor = _valor(mejor_suma, centro)
+            with cota.get_lock():
+                if mejor > cota.value:
+                    cota.value = mejor
+        if mejor == meta:
+            with exacto.get_lock():
+                exacto.value = min(exacto.value, seq)
+    return seq, mejor_suma, mejor_mascara, contador, bool(agotado)
+
+
+class EstadisticasBusqueda:
+    """Contadores de una búsqueda, para saber por qué tardó o se cortó.
+
+    nodos: nodos del árbol (bnb), items procesados (dp) o sumas de la primera mitad (mitm).
+    podas_cota: ramas descartadas porque ni tomando todo lo que queda superan la mejor suma.
+    podas_capacidad: cubos de los que no entraban todos los items en lo que falta del objetivo.
+    profundidad: cubo más profundo alcanzado (bnb) o filas de la tabla armadas (dp).
+    primera_mejora / ultima_mejora: segundos desde el inicio hasta la primera y la última mejora.
+    """
+    __slots__ = ('engine', 'nodos', 'podas_cota', 'podas_capacidad', 'profundidad', 'mejoras',
+                 'primera_mejora', 'ultima_mejora', 'segundos')
+
+    def __init__(self, engine=None):
+        self.engine = engine
+        self.nodos = self.podas_cota = self.podas_capacidad = self.profundidad = self.mejoras = 0
+        self.primera_mejora = self.ultima_mejora = None
+        self.segundos = 0.0
+
+    def volcar(self, contador):
+        self.nodos, self.podas_cota, self.podas_capacidad, self.profundidad = contador
+
+    def sumar(self, contador):
+        # Para combinar los contadores de los subárboles resueltos en paralelo.
+        self.nodos += contador[0]
+        self.podas_cota += contador[1]
+        self.podas_capacidad += contador[2]
+        self.profundidad = max(self.profundidad, contador[3])
+
+    def como_dict(self):
+        return {campo: getattr(self, campo) for campo in self.__slots__}
+
+
+class _Item:
+    # centavos: el monto entero en unidades de 10**-escala (centavos con la escala por defecto).
+    __slots__ = ('id', 'centavos', 'escala')
+
+    def __init__(self, item_id, centavos, escala):
+        self.id = item_id
+        self.centavos = centavos
+        self.escala = escala
+
+    @property
+    def monto(self):
+        # Sólo se arma el Decimal para los items que se muestran.
+        return dinero.a_decimal(self.centavos, self.escala)
+
+
+class CombinacionSolver:
+    def __init__(self, items_original_lista, monto_objetivo_str, time_limit_seconds=30, engine='auto', workers=1,
+                 modo='menor_igual', tolerancia='0', escala=dinero.ESCALA, unidades=False):
+        # Los montos de items_original_lista se convierten una vez con dinero.parsear (un int es
+        # un monto entero de pesos). Con unidades=True ya vienen como enteros en unidades de
+        # 10**-escala, como los devuelve Dataset.filas() del almacén.
+        self.items_procesados = []
+        self.escala = escala
+        if modo not in MODOS:
+            raise ValueError(f"Modo de búsqueda desconocido: {modo}. Opciones: {', '.join(MODOS)}")
+        self.modo = modo
+        try:
+            self.tolerancia = Decimal(str(tolerancia).strip() or '0')
+        except InvalidOperation:
+            raise ValueError("La tolerancia ingresada no es un número válido.")
+        if self.tolerancia < 0:
+            raise ValueError("La tolerancia no puede ser negativa.")
+        self.tolerancia_centavos = dinero.parsear(self.tolerancia, escala, ROUND_FLOOR)
+        self.fijar_objetivo(monto_objetivo_str)
+        if engine not in ENGINES:
+            raise ValueError(f"Motor de búsqueda desconocido: {engine}. Opciones: {', '.join(ENGINES)}")
+
+        self.engine = engine
+        # workers > 1 reparte la búsqueda 'bnb' en ese número de procesos.
+        self.workers = max(1, int(workers or 1))
+        self.time_limit_seconds = time_limit_seconds
+        self.start_time = 0
+        self.time_limit_exceeded_flag = False
+        self.estadisticas = EstadisticasBusqueda()
+        self.detenido = False
+        self._detener_externo = None
+
+        self.best_sum_found = Decimal('0')
+        self.best_selection_items_data = []
+
+        if self.monto_objetivo <= 0:
+            self.num_items = 0
+            return
+
+        for data_row in items_original_lista:
+            try:
+                item_id, monto = data_row[0], data_row[1]
+                centavos = int(monto) if unidades else dinero.parsear(monto, escala)
+                if centavos <= 0:
+                    continue
+                self.items_procesados.append(_Item(item_id, centavos, escala))
+            except Exception as e:
+                print(f"WARN [CombinacionSolver]: Item inválido omitido: {data_row} debido a {e}")
+                continue
+
+        self.items_procesados.sort(key=lambda x: x.centavos, reverse=True)
+        self.num_items = len(self.items_procesados)
+        self._agrupar_cubos()
+
+    @property
+    def nodos_explorados(self):
+        return self.estadisticas.nodos
+
+    @nodos_explorados.setter
+    def nodos_explorados(self, nodos):
+        self.estadisticas.nodos = nodos
+
+    def fijar_objetivo(self, monto_objetivo_str):
+        """Cambia el monto objetivo sin volver a procesar los items."""
+        try:
+            self.monto_objetivo = Decimal(monto_objetivo_str)
+        except InvalidOperation:
+            raise ValueError("El monto objetivo ingresado no es un número válido.")
+        # Nunca se puede exceder el objetivo, así que se redondea hacia abajo (hacia arriba si
+        # lo que no se puede es quedar por debajo).
+        redondeo = ROUND_CEILING if self.modo == 'mayor_igual' else ROUND_FLOOR
+        self.objetivo_centavos = dinero.parsear(self.monto_objetivo, self.escala, redondeo) if self.monto_objetivo > 0 else 0
+
+    def quitar_items(self, items):
+        """Saca de la búsqueda los items dados (por ejemplo, los ya usados por otro objetivo)."""
+        usados = set(map(id, items))
+        self.items_procesados = [item for item in self.items_procesados if id(item) not in usados]
+        self.num_items = len(self.items_procesados)
+        self._agrupar_cubos()
+
+    def _agrupar_cubos(self):
+        # Los montos repetidos se agrupan en cubos (monto, multiplicidad): elegir "k items de
+        # este monto" es una sola rama en lugar de C(multiplicidad, k) subárboles idénticos.
+        # Arreglos paralelos, indexados por cubo:
+        #   montos_cubo[b]   monto en centavos del cubo
+        #   cantidad_cubo[b] cuántos items tienen ese monto
+        #   inicio_cubo[b]   posición del primer item del cubo en items_procesados
+        #   resto_cubo[b]    suma de todos los items desde el cubo b en adelante
+        #   mcd_cubo[b]      MCD de los montos desde el cubo b: toda suma de esos cubos es múltiplo
+        self.montos_cubo = []
+        self.cantidad_cubo = []
+        self.inicio_cubo = []
+        for posicion, item in enumerate(self.items_procesados):
+            if self.montos_cubo and self.montos_cubo[-1] == item.centavos:
+                self.cantidad_cubo[-1] += 1
+            else:
+                self.montos_cubo.append(item.centavos)
+                self.cantidad_cubo.append(1)
+                self.inicio_cubo.append(posicion)
+        self.resto_cubo = [0] * (len(self.montos_cubo) + 1)
+        self.mcd_cubo = [0] * (len(self.montos_cubo) + 1)
+        for b in range(len(self.montos_cubo) - 1, -1, -1):
+            self.resto_cubo[b] = self.resto_cubo[b + 1] + self.montos_cubo[b] * self.cantidad_cubo[b]
+            self.mcd_cubo[b] = gcd(self.montos_cubo[b], self.mcd_cubo[b + 1])
+        self._cola = None
+
+    @property
+    def objetivo_alcanzable(self):
+        """Mayor suma <= objetivo que los montos podrían formar según su MCD.
+
+        Si el objetivo no es múltiplo del MCD no hay combinación exacta posible, y alcanzar este
+        valor ya prueba que la combinación es óptima.
+        """
+        mcd = self.mcd_cubo[0] if self.montos_cubo else 1
+        return self.objetivo_centavos - self.objetivo_centavos % mcd
+
+    @property
+    def clave_cache(self):
+        """Motor y modo, para distinguir en la caché de resultados búsquedas sobre el mismo objetivo."""
+        if self.modo == 'menor_igual':
+            return self.engine
+        if self.modo == 'tolerancia':
+            return f"{self.engine}:{self.modo}:{self.tolerancia_centavos}"
+        return f"{self.engine}:{self.modo}"
+
+    def _limites(self):
+        """(capacidad, centro, meta) en centavos para los motores, según el modo.
+
+        Los motores buscan, entre las sumas <= capacidad, la más cercana al centro (ver _valor) y
+        terminan al llegar a meta, el mejor valor que permite el MCD de los montos. En 'mayor_igual'
+        se busca qué items dejar afuera (ver _complemento), así que la capacidad es lo que sobra.
+        """
+        mcd = self.mcd_cubo[0] if self.montos_cubo else 1
+        objetivo = self.objetivo_centavos
+        if self.modo == 'mayor_igual':
+            objetivo = self.resto_cubo[0] - objetivo
+        if self.modo != 'tolerancia':
+            capacidad = objetivo - objetivo % mcd
+            return capacidad, capacidad, capacidad
+        capacidad = objetivo + self.tolerancia_centavos
+        capacidad -= capacidad % mcd
+        abajo = objetivo - objetivo % mcd
+        candidatas = [c for c in (abajo, abajo + mcd) if 0 < c <= capacidad]
+        return capacidad, objetivo, max((_valor(c, objetivo) for c in candidatas), default=0)
+
+    def _tablas_cola(self):
+        # Se arman en la primera búsqueda 'bnb' y sirven para cualquier objetivo.
+        if self._cola is None:
+            self._cola = _tablas_cola(self.montos_cubo, self.cantidad_cubo, self.resto_cubo)
+        return self._cola
+
+    def select_engine(self):
+        """Motor efectivo: el pedido explícitamente o el que elige 'auto'."""
+        if self.engine != 'auto':
+            return self.engine
+        capacidad = min(self._limites()[0], self.resto_cubo[0])
+        if self.num_items * (capacidad + 1) <= DP_MAX_BITS:
+            return 'dp'
+        if self.num_items <= MITM_MAX_ITEMS:
+            espacio_bnb = 1
+            for cantidad in self.cantidad_cubo:
+                espacio_bnb *= cantidad + 1
+            if espacio_bnb > (1 << (self.num_items // 2)) * MITM_VENTAJA_MIN:
+                return 'mitm'
+        return 'bnb'
+
+    def _tiempo_agotado(self):
+        if time.time() - self.start_time > self.time_limit_seconds:
+            if not self.time_limit_exceeded_flag:
+                print(f"INFO [CombinacionSolver]: Límite de tiempo de {self.time_limit_seconds}s alcanzado.")
+            self.time_limit_exceeded_flag = True
+        return self.time_limit_exceeded_flag
+
+    def _debe_detenerse(self):
+        if self._detener_externo is not None and self._detener_externo():
+            self.detenido = True
+            return True
+        return self._tiempo_agotado()
+
+    # Cada motor es un generador que produce (suma_centavos, mascara) cada vez que encuentra
+    # una combinación mejor que la anterior; bit i de la máscara <=> items_procesados[i] elegido.
+    # Todos terminan apenas alcanzan el objetivo exacto: nada puede superarlo.
+
+    # --- Motor 'bnb': ramificación y poda iterativa sobre cubos de montos iguales ---
+    def _solve_bnb(self):
+        contador = [0, 0, 0, 0]
+        cola, tablas = self._tablas_cola()
+        capacidad, centro, meta = self._limites()
+        for mejor, mascara in _ramificar(self.montos_cubo, self.cantidad_cubo, self.inicio_cubo,
+                                         self.resto_cubo, capacidad,
+                                         contador=contador, detener=self._debe_detenerse,
+                                         mcd=self.mcd_cubo, cola=cola, tablas=tablas, centro=centro, meta=meta):
+            self.estadisticas.volcar(contador)
+            yield mejor, mascara
+        self.estadisticas.volcar(contador)
+
+    # --- 'bnb' en paralelo: subárboles repartidos en un pool de procesos ---
+    def _dividir(self, cantidad_minima):
+        """Fija los primeros cubos hasta tener al menos cantidad_minima subárboles.
+
+        Devuelve (candidatos, subproblemas) en el orden en que la búsqueda serial visitaría
+        cada nodo: candidatos son los nodos intermedios (seq, suma, mascara) que se evalúan
+        acá mismo y subproblemas los prefijos (seq, conteos) que se envían a los procesos.
+        Nunca se fijan cubos de la cola: la serial los resuelve con las tablas, sin visitarlos.
+        """
+        montos, cantidades, objetivo = self.montos_cubo, self.cantidad_cubo, self._limites()[0]
+        cola, _ = self._tablas_cola()
+        profundidad = 0
+        sumas_nivel = [0]
+        while profundidad < cola and len(sumas_nivel) < cantidad_minima:
+            monto = montos[profundidad]
+            sumas_nivel = [s + k * monto for s in sumas_nivel
+                           for k in range(min(cantidades[profundidad], (objetivo - s) // monto), -1, -1)]
+            profundidad += 1
+
+        candidatos = []
+        subproblemas = []
+        pendientes = [((), 0, 0)]  # pila DFS de (conteos, suma, mascara)
+        while pendientes:
+            conteos, suma, mascara = pendientes.pop()
+            seq = len(candidatos) + len(subproblemas)
+            nivel = len(conteos)
+            if nivel == profundidad:
+                subproblemas.append((seq, conteos))
+                continue
+            candidatos.append((seq, suma, mascara))
+            monto = montos[nivel]
+            maximo = min(cantidades[nivel], (objetivo - suma) // monto)
+            # Se apilan de menor a mayor para que k = máximo salga primero, como en _ramificar.
+            for k in range(maximo + 1):
+                pendientes.append((conteos + (k,), suma + k * monto,
+                                   mascara | ((1 << k) - 1) << self.inicio_cubo[nivel]))
+        return candidatos, subproblemas
+
+    def _solve_bnb_paralelo(self):
+        # Mismo resultado que la búsqueda serial: entre combinaciones de igual suma gana la que
+        # la serial hubiera visitado primero (menor seq). Por eso los procesos podan con la cota
+        # compartida sólo cuando el subárbol no puede ni empatarla.
+        limites = self._limites()
+        capacidad, centro, meta = limites
+        candidatos, subproblemas = self._dividir(self.workers * SUBPROBLEMAS_POR_PROCESO)
+        mejor = (_piso(capacidad, centro), 0)  # (_valor(suma), -seq)
+        cota = multiprocessing.Value('q', mejor[0])
+        exacto = multiprocessing.Value('q', len(candidatos) + len(subproblemas))
+        for seq, suma, mascara in candidatos:
+            if suma and (_valor(suma, centro), -seq) > mejor:
+                mejor = (_valor(suma, centro), -seq)
+                yield suma, mascara
+        cota.value = mejor[0]
+        if mejor[0] == meta:
+            return
+
+        deadline = self.start_time + self.time_limit_seconds
+        pool = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_iniciar_proceso,
+            initargs=(self.montos_cubo, self.cantidad_cubo, self.inicio_cubo, self.resto_cubo,
+                      self.mcd_cubo, *self._tablas_cola(), limites, deadline, cota, exacto))
+        try:
+            pendientes = {pool.submit(_resolver_subproblema, seq, conteos) for seq, conteos in subproblemas}
+            while pendientes:
+                listos, pendientes = wait(pendientes, timeout=_ESPERA_PROCESOS, return_when=FIRST_COMPLETED)
+                for futuro in listos:
+                    seq, suma, mascara, contador, agotado = futuro.result()
+                    self.estadisticas.sumar(contador)
+                    if agotado:
+                        self._tiempo_agotado()
+                    if suma and (_valor(suma, centro), -seq) > mejor:
+                        mejor = (_valor(suma, centro), -seq)
+                        yield suma, mascara
+                if self._detener_externo is not None and self._debe_detenerse():
+                    break
+        finally:
+            exacto.value = -1  # Cualquier proceso que siga corriendo se detiene.
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _items_de_mascara(self, mascara):
+        seleccion = []
+        while mascara:
+            bit = mascara & -mascara
+            seleccion.append(self.items_procesados[bit.bit_length() - 1])
+            mascara ^= bit
+        return seleccion
+
+    # --- Motor 'dp': sumas alcanzables en centavos como bitset (int de Python) ---
+    def _filas_dp(self, objetivo, finales=()):
+        # filas[i] = sumas alcanzables usando los primeros i items (bit s encendido <=> s alcanzable).
+        # Se deja de agregar items apenas es alcanzable alguna de las sumas finales.
+        limite = (1 << (objetivo + 1)) - 1
+        filas = [1]
+        alcanzables = 1
+        for i, item in enumerate(self.items_procesados):
+            if i % 64 == 0 and self._debe_detenerse():
+                break  # La mejor suma con los items ya procesados sigue siendo válida.
+            alcanzables = (alcanzables | (alcanzables << item.centavos)) & limite
+            filas.append(alcanzables)
+            self.nodos_explorados = self.estadisticas.profundidad = i + 1
+            if any((alcanzables >> s) & 1 for s in finales):
+                break  # Ya se alcanza la mejor suma posible, ningún item extra puede mejorarla.
+        return filas
+
+    def _mejor_en_filas(self, filas, objetivo):
+        """Mayor suma alcanzable <= objetivo según las filas, y la máscara que la forma."""
+        mejor = (filas[-1] & ((1 << (objetivo + 1)) - 1)).bit_length() - 1
+        return mejor, self._mascara_en_filas(filas, mejor)
+
+    def _mascara_en_filas(self, filas, suma):
+        mascara = 0
+        for i in range(len(filas) - 1, 0, -1):
+            if not (filas[i - 1] >> suma) & 1:
+                mascara |= 1 << (i - 1)
+                suma -= self.items_procesados[i - 1].centavos
+        return mascara
+
+    def _solve_dp(self):
+        capacidad, centro, meta = self._limites()
+        # Sumas con el mejor valor posible: meta misma y, en 'tolerancia', su espejo sobre el centro.
+        finales = [s for s in {meta, 2 * centro - meta} if 0 < s <= capacidad]
+        filas = self._filas_dp(capacidad, finales)
+        mejor = _mas_cercano(filas[-1] & ~1, centro, capacidad)
+        if mejor > 0:
+            yield mejor, self._mascara_en_filas(filas, mejor)
+
+    # --- Motor 'mitm': meet-in-the-middle, 2 * 2**(n/2) sumas en lugar de 2**n ---
+    def _sumas_subconjuntos(self, items):
+        # Al duplicar la lista en cada item, el índice de cada suma es la máscara de bits
+        # del subconjunto que la forma.
+        sumas = [0]
+        for item in items:
+            centavos = item.centavos
+            sumas += [s + centavos for s in sumas]
+            if self._debe_detenerse():
+                return None
+        return sumas
+
+    def _solve_mitm(self):
+        capacidad, centro, meta = self._limites()
+        mitad = self.num_items // 2
+        sumas_a = self._sumas_subconjuntos(self.items_procesados[:mitad])
+        sumas_b = self._sumas_subconjuntos(self.items_procesados[mitad:]) if sumas_a is not None else None
+        if sumas_b is None:
+            return
+
+        orden_b = sorted(range(len(sumas_b)), key=sumas_b.__getitem__)
+        sumas_b_ordenadas = [sumas_b[j] for j in orden_b]
+        mejor = _piso(capacidad, centro)
+        for mascara_a, suma_a in enumerate(sumas_a):
+            if suma_a > capacidad:
+                continue
+            # Las candidatas son la mayor suma de b que no pasa del centro y la siguiente.
+            pos = bisect_right(sumas_b_ordenadas, centro - suma_a)
+            for j in (pos - 1, pos):
+                if j < 0 or j == len(sumas_b_ordenadas) or suma_a + sumas_b_ordenadas[j] > capacidad:
+                    continue
+                total = suma_a + sumas_b_ordenadas[j]
+                if total and _valor(total, centro) > mejor:
+                    mejor = _valor(total, centro)
+                    self.nodos_explorados = mascara_a + 1
+                    yield total, mascara_a | (orden_b[j] << mitad)
+                    if mejor == meta:
+                        return
+            if mascara_a % _CHEQUEO_TIEMPO == 0 and self._debe_detenerse():
+                break
+        self.nodos_explorados = len(sumas_a)
+
+    def _buscar(self, detener=None):
+        self.start_time = time.time()
+        self.time_limit_exceeded_flag = False
+        self.detenido = False
+        self._detener_externo = detener
+        engine = self.select_engine()
+        if self.modo == 'menor_igual' and self.objetivo_alcanzable < self.objetivo_centavos:
+            paso = dinero.formatear(self.mcd_cubo[0], self.escala)
+            mejor_posible = dinero.formatear(self.objetivo_alcanzable, self.escala)
+            print(f"INFO [CombinacionSolver]: Los montos son múltiplos de {paso}: "
+                  f"ninguna combinación suma exacto el objetivo, la mejor posible es {mejor_posible}.")
+        if engine == 'dp':
+            busqueda = self._solve_dp()
+        elif engine == 'mitm':
+            busqueda = self._solve_mitm()
+        elif self.workers > 1:
+            engine = f"{engine} x{self.workers}"
+            busqueda = self._solve_bnb_paralelo()
+        else:
+            busqueda = self._solve_bnb()
+        if self.modo == 'mayor_igual':
+            busqueda = self._complemento(busqueda)
+        self.estadisticas = EstadisticasBusqueda(engine)
+        return engine, self._medir(busqueda)
+
+    def _complemento(self, busqueda):
+        # Modo 'mayor_igual': el motor elige qué items dejar afuera, lo más posible sin pasar de
+        # total - objetivo; los que quedan adentro son entonces lo menos posible sin bajar del objetivo.
+        total = self.resto_cubo[0]
+        todos = (1 << self.num_items) - 1
+        try:
+            if total < self.objetivo_centavos:
+                return  # Ni sumando todo se llega al objetivo.
+            yield total, todos
+            for afuera, mascara in busqueda:
+                yield total - afuera, todos ^ mascara
+        finally:
+            busqueda.close()
+
+    def _medir(self, busqueda):
+        # Envuelve al motor para anotar cuándo llegan las mejoras y cuánto duró la búsqueda.
+        estadisticas = self.estadisticas
+        try:
+            for centavos, mascara in busqueda:
+                transcurrido = time.time() - self.start_time
+                if estadisticas.primera_mejora is None:
+                    estadisticas.primera_mejora = transcurrido
+                estadisticas.ultima_mejora = transcurrido
+                estadisticas.mejoras += 1
+                yield centavos, mascara
+        finally:
+            busqueda.close()
+            estadisticas.segundos = time.time() - self.start_time
+
+    def _mejora(self, centavos, mascara):
+        combinacion = [(item.id, item.monto) for item in self._items_de_mascara(mascara)]
+        return Mejora(combinacion, dinero.a_decimal(centavos, self.escala), time.time() - self.start_time, self.nodos_explorados)
+
+    def iter_improvements(self):
+        """Genera una Mejora por cada combinación mejor que la anterior, a medida que aparecen.
+
+        La búsqueda avanza sólo mientras se consume el generador, así que quien llama puede
+        quedarse con la mejor combinación hasta el momento y dejar de iterar cuando quiera.
+        """
+        if self.monto_objetivo <= 0 or not self.items_procesados:
+            return
+        _, busqueda = self._buscar()
+        for centavos, mascara in busqueda:
+            yield self._mejora(centavos, mascara)
+
+    # --- Enumeración de varias combinaciones, de la más cercana al objetivo en adelante ---
+    def _enumerar_filas(self, filas, suma):
+        """Máscaras de todas las combinaciones que suman exactamente suma, según las filas del 'dp'.
+
+        Sólo se apilan pasos que la tabla garantiza completables, así que cada rama termina en una
+        combinación; la pila nunca tiene más de 2 * len(filas) entradas.
+        """
+        pila = [(len(filas) - 1, suma, 0)]
+        while pila:
+            i, falta, mascara = pila.pop()
+            if i == 0:
+                yield mascara
+                continue
+            anterior = filas[i - 1]
+            centavos = self.items_procesados[i - 1].centavos
+            if (anterior >> falta) & 1:
+                pila.append((i - 1, falta, mascara))
+            if falta >= centavos and (anterior >> (falta - centavos)) & 1:
+                pila.append((i - 1, falta - centavos, mascara | 1 << (i - 1)))
+
+    def _enumerar_profundidad(self, suma):
+        """Como _enumerar_filas, sin tabla: búsqueda en profundidad podada por lo que queda."""
+        items = self.items_procesados
+        resto = [0] * (len(items) + 1)
+        for i in range(len(items) - 1, -1, -1):
+            resto[i] = resto[i + 1] + items[i].centavos
+        pila = [(0, suma, 0)]
+        nodos = 0
+        while pila:
+            nodos += 1
+            if nodos % _CHEQUEO_TIEMPO == 0 and self._debe_detenerse():
+                return
+            i, falta, mascara = pila.pop()
+            if falta == 0:
+                yield mascara
+            elif falta <= resto[i]:
+                pila.append((i + 1, falta, mascara))
+                if items[i].centavos <= falta:
+                    pila.append((i + 1, falta - items[i].centavos, mascara | 1 << i))
+
+    def _sumas_por_cercania(self, fila, capacidad, centro):
+        # Sumas alcanzables (bits de fila) de mayor a menor _valor(); ante empate, la menor.
+        abajo = (fila & ((2 << min(centro, capacidad)) - 1)).bit_length() - 1
+        arriba = centro + 1
+        while True:
+            encima = fila >> arriba if arriba <= capacidad else 0
+            siguiente = arriba + (encima & -encima).bit_length() - 1 if encima else None
+            if abajo < 0 and siguiente is None:
+                return
+            if siguiente is None or (abajo >= 0 and _valor(abajo, centro) >= _valor(siguiente, centro)):
+                yield abajo
+                abajo = (fila & ((1 << abajo) - 1)).bit_length() - 1 if abajo > 0 else -1
+            else:
+                yield siguiente
+                arriba = siguiente + 1
+
+    def iter_combinaciones(self, suma=None, detener=None):
+        """Genera Alternativa(combinacion, suma) de a una, de la más cercana al objetivo en adelante
+        (según el modo), sin repetir y sin rehacer la búsqueda entre una y otra.
+
+        Con suma, sólo las combinaciones que suman exactamente eso. Si la tabla del motor 'dp' entra
+        en DP_MAX_BITS se recorre hacia atrás; si no, una búsqueda en profundidad enumera las que
+        suman exactamente suma o, si no se indica, la mejor suma de find_combination(). Se corta
+        con el límite de tiempo o cuando detener() devuelve True.
+        """
+        if self.monto_objetivo <= 0 or not self.items_procesados:
+            return
+        self.start_time = time.time()
+        self.time_limit_exceeded_flag = False
+        self.detenido = False
+        self._detener_externo = detener
+        total = self.resto_cubo[0]
+        complemento = self.modo == 'mayor_igual'
+        todos = (1 << self.num_items) - 1
+        capacidad, centro, _ = self._limites()
+        if suma is not None:
+            # Las sumas internas de 'mayor_igual' son las de los items que quedan afuera.
+            buscada = dinero.parsear(suma, self.escala)
+            capacidad = total - buscada if complemento else buscada
+            if not 0 <= capacidad <= total:
+                return
+
+        if capacidad < 0:
+            sumas, filas = (), None
+        elif self.num_items * (capacidad + 1) <= DP_MAX_BITS:
+            filas = self._filas_dp(capacidad)
+            if len(filas) <= self.num_items:
+                return  # Se cortó armando la tabla.
+            sumas = (capacidad,) if suma is not None else self._sumas_por_cercania(filas[-1], capacidad, centro)
+        else:
+            filas = None
+            if suma is None:
+                if not self.best_selection_items_data:
+                    self.find_combination(detener=detener)
+                    self.start_time = time.time()
+                    self.time_limit_exceeded_flag = False
+                buscada = dinero.parsear(self.best_sum_found, self.escala)
+                capacidad = total - buscada if complemento else buscada
+            sumas = (capacidad,)
+
+        for interna in sumas:
+            if filas is not None and not (filas[-1] >> interna) & 1:
+                continue
+            real = total - interna if complemento else interna
+            if real == 0:
+                continue  # La combinación vacía no sirve.
+            mascaras = self._enumerar_filas(filas, interna) if filas is not None else self._enumerar_profundidad(interna)
+            for i, mascara in enumerate(mascaras):
+                if i % 64 == 0 and self._debe_detenerse():
+                    return
+                if complemento:
+                    mascara ^= todos
+                yield Alternativa([(item.id, item.monto) for item in self._items_de_mascara(mascara)],
+                                  dinero.a_decimal(real, self.escala))
+
+    def find_combination(self, progress_callback=None, detener=None):
+        """Busca la mejor combinación. Si se pasa progress_callback, se la llama con cada
+        Mejora encontrada; si devuelve True, la búsqueda se detiene y se usa esa Mejora.
+        detener() se consulta periódicamente (junto con el límite de tiempo): si devuelve True
+        se corta la búsqueda con la mejor combinación hasta el momento y self.detenido queda True.
+        """
+        self.best_sum_found = Decimal('0')
+        self.best_selection_items_data = []
+        if self.monto_objetivo <= 0 or not self.items_procesados:
+            return [], Decimal('0'), self.monto_objetivo, self.time_limit_exceeded_flag
+
+        engine, busqueda = self._buscar(detener)
+        mejor, mejor_mascara = 0, 0
+        for mejor, mejor_mascara in busqueda:
+            if progress_callback is not None and progress_callback(self._mejora(mejor, mejor_mascara)):
+                busqueda.close()
+                self.detenido = True
+                print("INFO [CombinacionSolver]: Búsqueda detenida: se aceptó la mejor combinación hasta el momento.")
+                break
+        self.best_sum_found = dinero.a_decimal(mejor, self.escala)
+        self.best_selection_items_data = self._items_de_mascara(mejor_mascara)
+
+        final_combination_output = []
+        for item_data in self.best_selection_items_data:
+            final_combination_output.append((item_data.id, item_data.monto))
+        elapsed_time = time.time() - self.start_time
+        print(f"INFO [CombinacionSolver]: Búsqueda ({engine}) completada en {elapsed_time:.2f}s. Mejor suma: {self.best_sum_found}. Nodos: {self.nodos_explorados}")
+        if self.detenido:
+            print("INFO [CombinacionSolver]: La búsqueda fue detenida antes de terminar.")
+        elif self.time_limit_exceeded_flag:
+            print("WARN [CombinacionSolver]: La búsqueda fue terminada por límite de tiempo...")
+        return final_combination_output, self.best_sum_found, self.monto_objetivo, self.time_limit_exceeded_flag
+
+
+ResultadoLote = namedtuple('ResultadoLote', ['monto_objetivo', 'combinacion', 'suma', 'time_exceeded'])
+
+
+class LoteSolver:
+    """Resuelve varios montos objetivo contra la misma planilla.
+
+    Los items se procesan una sola vez. Si para el mayor objetivo corresponde el motor 'dp', la
+    tabla de sumas alcanzables también se arma una sola vez y cada objetivo se responde leyéndola.
+    Con sin_repetir=True los objetivos se resuelven en el orden dado y cada uno sólo puede usar
+    items que no hayan usado los anteriores.
+    """
+
+    def __init__(self, items_original_lista, montos_objetivo, time_limit_seconds=30, engine='auto',
+                 workers=1, sin_repetir=False, escala=dinero.ESCALA, unidades=False):
+        if not montos_objetivo:
+            raise ValueError("No se ingresó ningún monto objetivo.")
+        self.montos_objetivo = []
+        for texto in montos_objetivo:
+            try:
+                self.montos_objetivo.append(Decimal(str(texto).strip()))
+            except InvalidOperation:
+                raise ValueError(f"El monto objetivo '{texto}' no es un número válido.")
+        self.sin_repetir = sin_repetir
+        self.solver = CombinacionSolver(items_original_lista, max(self.montos_objetivo),
+                                        time_limit_seconds=time_limit_seconds, engine=engine, workers=workers,
+                                        escala=escala, unidades=unidades)
+
+    def _tabla_compartida(self, detener):
+        solver = self.solver
+        if self.sin_repetir or not solver.num_items or solver.select_engine() != 'dp':
+            return None
+        solver.start_time = time.time()
+        solver.time_limit_exceeded_flag = False
+        solver.detenido = False
+        solver._detener_externo = detener
+        return solver._filas_dp(solver.objetivo_centavos)
+
+    def iter_resultados(self, detener=None):
+        """Genera un ResultadoLote por objetivo, en el orden en que se ingresaron."""
+        solver = self.solver
+        filas = self._tabla_compartida(detener)
+        # Si la tabla quedó a medio armar, sus respuestas son válidas pero podrían no ser óptimas.
+        tabla_incompleta = filas is not None and (solver.time_limit_exceeded_flag or solver.detenido)
+        for monto in self.montos_objetivo:
+            if detener is not None and detener():
+                break
+            solver.fijar_objetivo(monto)
+            if filas is not None:
+                mejor, mascara = solver._mejor_en_filas(filas, solver.objetivo_centavos)
+                items = solver._items_de_mascara(mascara)
+                yield ResultadoLote(solver.monto_objetivo, [(item.id, item.monto) for item in items],
+                                    dinero.a_decimal(mejor, solver.escala), tabla_incompleta)
+                continue
+            combinacion, suma, _, time_exceeded = solver.find_combination(detener=detener)
+            yield ResultadoLote(solver.monto_objetivo, combinacion, suma, time_exceeded)
+            if self.sin_repetir and solver.best_selection_items_data:
+                solver.quitar_items(solver.best_selection_items_data)
@@ -0,0 +1,56 @@
+# test_almacen.py
+import os
+import time
+from array import array
+
+import pytest
+from flask import Flask
+
+import almacen
+
+
+@pytest.fixture
+def app_almacen(tmp_path):
+    app = Flask(__name__)
+    app.config.update(DATASET_DIR=str(tmp_path / 'datasets'), DATASET_TTL=60)
+    with app.app_context():
+        yield app
+
+
+def test_guardar_y_cargar(app_almacen):
+    clave = almacen.guardar(['R1', 'Ñandú 2', ''], array('q', [4488194, -300, 1]))
+    assert clave == almacen.guardar(['R1', 'Ñandú 2', ''], [4488194, -300, 1])  # mismo contenido, misma clave
+
+    dataset = almacen.cargar(clave)
+    assert dataset.ids == ['R1', 'Ñandú 2', '']
+    assert list(dataset.centavos) == [4488194, -300, 1]
+    assert dataset.como_lista() == [['R1', '44881.94'], ['Ñandú 2', '-3.00'], ['', '0.01']]
+
+    almacen.eliminar(clave)
+    assert almacen.cargar(clave) is None
+
+
+def test_vencimiento_y_claves_invalidas(app_almacen):
+    clave = almacen.guardar(['A'], [100])
+    ruta = os.path.join(app_almacen.config['DATASET_DIR'], clave + '.bin')
+    viejo = time.time() - 120
+    os.utime(ruta, (viejo, viejo))
+    assert almacen.cargar(clave) is None
+    assert not os.path.exists(ruta)
+    assert almacen.cargar('../../etc/passwd') is None
+
+
+def test_escala_y_formato_anterior(app_almacen):
+    clave = almacen.guardar(['A', 'B'], [1235, 5], escala=3)
+    assert clave != almacen.guardar(['A', 'B'], [1235, 5])  # otra escala, otra planilla
+    dataset = almacen.cargar(clave)
+    assert dataset.escala == 3
+    assert almacen.leer_escala(clave) == 3
+    assert almacen.leer_escala('f' * 64) is None
+    assert dataset.filas() == [('A', 1235), ('B', 5)]
+    assert dataset.como_lista() == [['A', '1.235'], ['B', '0.005']]
+
+    # Los blobs guardados antes de que existiera la escala se leen como centavos.
+    viejo = almacen._CABECERA_V1.pack(almacen._MAGIC_V1, 1) + array('q', [250]).tobytes() + b'X'
+    dataset = almacen._deserializar('0' * 64, viejo)
+    assert (dataset.escala, dataset.como_lista()) == (2, [['X', '2.50']])
@@ -0,0 +1,37 @@
+# test_app.py
+import subprocess
+import sys
+
+import pytest
+
+from app import create_app
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'app.sqlite'}",
+                      'DATASET_DIR': str(tmp_path / 'datasets')})
+    yield app
+
+
+def test_rutas_livianas_y_calculador_con_login(app):
+    cliente = app.test_client()
+    assert cliente.get('/').status_code == 200
+    respuesta = cliente.get('/calculador')
+    assert respuesta.status_code == 302 and '/login' in respuesta.headers['Location']
+
+
+def test_init_db(app):
+    resultado = app.test_cli_runner().invoke(args=['init-db'])
+    assert 'tablas creadas' in resultado.output
+    with app.app_context():
+        from extensions import db
+        assert {'user', 'trabajo_calculo'} <= set(db.inspect(db.engine).get_table_names())
+
+
+def test_arranque_no_importa_modulos_pesados():
+    # En un proceso aparte: en este los tests de ingesta/solver ya los importaron.
+    codigo = ("import sys, app; a = app.create_app(); a.test_client().get('/'); "
+              "print(sorted(m for m in ('pandas', 'openpyxl', 'solver') if m in sys.modules))")
+    salida = subprocess.run([sys.executable, '-c', codigo], capture_output=True, text=True, check=True).stdout
+    assert salida.strip().splitlines()[-1] == '[]'
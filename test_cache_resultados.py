@@ -0,0 +1,38 @@
+# test_cache_resultados.py
+from cache_resultados import CacheResultados, ResultadoCacheado
+
+
+def _resultado(suma, time_exceeded, time_limit):
+    return ResultadoCacheado([['R1', suma]], suma, time_exceeded, time_limit)
+
+
+def test_resultados_cortados_por_tiempo_solo_con_igual_o_menor_limite():
+    cache = CacheResultados()
+    cache.guardar('abc', 1000, 'auto', _resultado('9.00', True, 30))
+    assert cache.obtener('abc', 1000, 'auto', 10).suma == '9.00'
+    assert cache.obtener('abc', 1000, 'auto', 60) is None
+    assert cache.obtener('abc', 1000, 'bnb', 10) is None
+
+    cache.guardar('abc', 1000, 'auto', _resultado('10.00', False, 5))
+    assert cache.obtener('abc', 1000, 'auto', 600).suma == '10.00'
+    cache.guardar('abc', 1000, 'auto', _resultado('8.00', True, 60))  # no pisa al óptimo
+    assert cache.obtener('abc', 1000, 'auto', 30).suma == '10.00'
+
+
+def test_lru_desaloja_el_menos_usado():
+    cache = CacheResultados(capacidad=2)
+    for objetivo in (1, 2):
+        cache.guardar('abc', objetivo, 'auto', _resultado('1.00', False, 30))
+    cache.obtener('abc', 1, 'auto', 30)
+    cache.guardar('abc', 3, 'auto', _resultado('1.00', False, 30))
+    assert cache.obtener('abc', 2, 'auto', 30) is None
+    assert cache.obtener('abc', 1, 'auto', 30) is not None
+
+
+def test_nivel_sqlite_compartido(tmp_path):
+    ruta = str(tmp_path / 'resultados.sqlite')
+    CacheResultados(ruta_sqlite=ruta).guardar('abc', 1000, 'auto', _resultado('9.00', True, 30))
+    otro_proceso = CacheResultados(ruta_sqlite=ruta)
+    assert otro_proceso.obtener('abc', 1000, 'auto', 30).combinacion == [['R1', '9.00']]
+    otro_proceso.guardar('abc', 1000, 'auto', _resultado('7.00', True, 10))  # peor: no pisa
+    assert CacheResultados(ruta_sqlite=ruta).obtener('abc', 1000, 'auto', 30).suma == '9.00'
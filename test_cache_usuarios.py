@@ -0,0 +1,67 @@
+# test_cache_usuarios.py
+import pytest
+from flask import Flask
+from sqlalchemy import event
+
+from cache_usuarios import CacheUsuarios
+from extensions import db
+from models import User
+
+
+@pytest.fixture
+def sesion():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        usuario = User(username='ana', email='ana@x.com')
+        usuario.set_password('secreta1')
+        db.session.add(usuario)
+        db.session.commit()
+        yield db.session
+
+
+def _contar_consultas(sesion):
+    consultas = []
+    event.listen(sesion.get_bind(), 'before_cursor_execute', lambda *args: consultas.append(args[2]))
+    return consultas
+
+
+def test_reusa_el_usuario_sin_consultar(sesion):
+    cache = CacheUsuarios(User, ttl=60)
+    consultas = _contar_consultas(sesion)
+    primero = cache.cargar(sesion, 1)
+    sesion.remove()  # fin de la request: la instancia cargada queda detached
+    segundo = cache.cargar(sesion, 1)
+    assert len(consultas) == 1
+    assert segundo is not primero  # cada request recibe su propia instancia
+    assert (segundo.id, segundo.username, segundo.check_password('secreta1')) == (1, 'ana', True)
+    assert cache.cargar(sesion, 99) is None
+
+
+def test_vence_y_se_invalida_al_cambiar_la_contrasena(sesion, monkeypatch):
+    cache = CacheUsuarios(User, ttl=60)
+    cache.cargar(sesion, 1)
+
+    usuario = sesion.get(User, 1)
+    usuario.set_password('otra-clave')
+    sesion.commit()
+    assert cache.obtener(1) is None
+    assert cache.cargar(sesion, 1).check_password('otra-clave')
+
+    reloj = [1000.0]
+    monkeypatch.setattr('cache_usuarios.time.monotonic', lambda: reloj[0])
+    cache.guardar(sesion.get(User, 1))
+    reloj[0] += 61
+    assert cache.obtener(1) is None
+
+
+def test_ttl_cero_no_guarda_y_capacidad(sesion):
+    sin_cache = CacheUsuarios(User, ttl=0)
+    assert sin_cache.cargar(sesion, 1) is not None
+    assert sin_cache.obtener(1) is None
+    cache = CacheUsuarios(User, ttl=60, capacidad=1)
+    cache.guardar(User(id=5, username='b', email='b@x.com', password_hash='x'))
+    cache.guardar(User(id=6, username='c', email='c@x.com', password_hash='x'))
+    assert cache.obtener(5) is None and cache.obtener(6).username == 'c'
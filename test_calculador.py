@@ -0,0 +1,177 @@
+# test_calculador.py
+import io
+import random
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import almacen
+import trabajos
+from app import create_app
+from extensions import db
+from models import TrabajoCalculo, User
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({'TESTING': True, 'WTF_CSRF_ENABLED': False,
+                      'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'app.sqlite'}",
+                      'DATASET_DIR': str(tmp_path / 'datasets'), 'SOLVER_TIME_LIMIT': 30})
+    with app.app_context():
+        db.create_all()
+        usuario = User(username='ana', email='ana@example.com')
+        usuario.set_password('secreta')
+        db.session.add(usuario)
+        db.session.commit()
+    yield app
+
+
+@pytest.fixture
+def cliente(app):
+    cliente = app.test_client()
+    with cliente.session_transaction() as sesion:
+        sesion['_user_id'] = '1'
+        sesion['_fresh'] = True
+    return cliente
+
+
+def _cargar(cliente, filas):
+    contenido = 'ID,Monto\n' + ''.join(f'{item_id},{monto}\n' for item_id, monto in filas)
+    respuesta = cliente.post('/calculador', data={'excel_file': (io.BytesIO(contenido.encode()), 'datos.csv')},
+                             content_type='multipart/form-data')
+    assert respuesta.status_code == 302
+
+
+def _encolar(cliente, monto_objetivo):
+    respuesta = cliente.post('/calculador', data={'monto_objetivo': monto_objetivo})
+    assert respuesta.status_code == 302 and '/calculador/trabajo/' in respuesta.headers['Location']
+    return respuesta.headers['Location'].rsplit('/', 1)[-1]
+
+
+def _esperar(cliente, trabajo_id, segundos=20):
+    limite = time.monotonic() + segundos
+    while time.monotonic() < limite:
+        estado = cliente.get(f'/calculador/trabajo/{trabajo_id}/estado').get_json()
+        if estado['estado'] in ('terminado', 'error'):
+            return estado
+        time.sleep(0.05)
+    raise AssertionError(f"El trabajo {trabajo_id} no terminó")
+
+
+def _planilla_lenta():
+    # Montos sin repetir y un objetivo imposible: la búsqueda llega al límite de tiempo si nadie la corta.
+    generador = random.Random(7)
+    return [(f'R{i}', f'{generador.randint(100000, 99999999) / 100:.2f}') for i in range(60)]
+
+
+def test_encolar_estado_y_resultados(cliente):
+    _cargar(cliente, [('A', '10.00'), ('B', '5.25'), ('C', '3.10'), ('D', '1.65')])
+    trabajo_id = _encolar(cliente, '8.35')
+    estado = _esperar(cliente, trabajo_id)
+    assert estado['estado'] == 'terminado'
+    pagina = cliente.get(f'/calculador/trabajo/{trabajo_id}').get_data(as_text=True)
+    assert 'Resultados del Calculador' in pagina and '8.35' in pagina
+
+
+def test_trabajo_de_otro_usuario(app, cliente):
+    with app.app_context():
+        db.session.add(TrabajoCalculo(id='x' * 32, user_id=2, filename='otro.csv'))
+        db.session.commit()
+    assert cliente.get(f'/calculador/trabajo/{"x" * 32}').status_code == 404
+
+
+def test_aceptar_desde_la_ruta(cliente):
+    _cargar(cliente, _planilla_lenta())
+    trabajo_id = _encolar(cliente, '777777.77')
+    inicio = time.monotonic()
+    respuesta = cliente.post(f'/calculador/trabajo/{trabajo_id}/aceptar')
+    assert respuesta.status_code == 302
+    assert _esperar(cliente, trabajo_id)['estado'] == 'terminado'
+    assert time.monotonic() - inicio < 10
+    assert 'Resultados del Calculador' in cliente.get(f'/calculador/trabajo/{trabajo_id}').get_data(as_text=True)
+
+
+def test_aceptar_desde_otro_proceso(app, cliente):
+    # El pedido llega a otro worker: sólo queda la marca en la base, sin el Event local.
+    _cargar(cliente, _planilla_lenta())
+    trabajo_id = _encolar(cliente, '777777.77')
+    inicio = time.monotonic()
+    with app.app_context():
+        db.session.execute(db.update(TrabajoCalculo).where(TrabajoCalculo.id == trabajo_id)
+                           .values(aceptar_pedido=True))
+        db.session.commit()
+    assert _esperar(cliente, trabajo_id)['estado'] == 'terminado'
+    assert time.monotonic() - inicio < trabajos.LATIDO_INTERVALO + 5
+
+
+def test_trabajo_sin_latido_se_marca_como_error(app, cliente):
+    viejo = datetime.utcnow() - timedelta(seconds=app.config['SOLVER_TRABAJO_ABANDONO'] + 1)
+    with app.app_context():
+        db.session.add(TrabajoCalculo(id='p' * 32, user_id=1, filename='datos.csv', estado='en_proceso',
+                                      creado=viejo, latido=viejo))
+        db.session.add(TrabajoCalculo(id='n' * 32, user_id=1, filename='datos.csv', estado='pendiente'))
+        db.session.commit()
+    assert cliente.get(f'/calculador/trabajo/{"p" * 32}/estado').get_json()['estado'] == 'error'
+    assert 'reinició' in cliente.get(f'/calculador/trabajo/{"p" * 32}').get_data(as_text=True)
+    # Uno recién creado todavía no se da por perdido.
+    assert cliente.get(f'/calculador/trabajo/{"n" * 32}/estado').get_json()['estado'] == 'pendiente'
+
+
+def test_reset_no_borra_la_planilla_compartida(app, cliente):
+    _cargar(cliente, [('A', '10.00'), ('B', '5.25')])
+    with cliente.session_transaction() as sesion:
+        clave = sesion['dataset']
+    assert cliente.get('/calculador/reset').status_code == 302
+    with cliente.session_transaction() as sesion:
+        assert 'dataset' not in sesion
+    with app.app_context():
+        assert almacen.cargar(clave) is not None
+
+
+def test_diferencia_en_la_escala_de_la_planilla(app, cliente):
+    app.config['MONTO_ESCALA'] = 3
+    _cargar(cliente, [('A', '1.235'), ('B', '2.5')])
+    trabajo_id = _encolar(cliente, '1.5')
+    assert _esperar(cliente, trabajo_id)['estado'] == 'terminado'
+    assert 'Diferencia: <strong>$0.265</strong>' in cliente.get(f'/calculador/trabajo/{trabajo_id}').get_data(as_text=True)
+
+
+def test_diferencia_en_modo_tolerancia(cliente):
+    _cargar(cliente, [('A', '0.40'), ('B', '3.00')])
+    respuesta = cliente.post('/calculador', data={'monto_objetivo': '0.19', 'modo': 'tolerancia', 'tolerancia': '1.75'})
+    trabajo_id = respuesta.headers['Location'].rsplit('/', 1)[-1]
+    assert _esperar(cliente, trabajo_id)['estado'] == 'terminado'
+    pagina = cliente.get(f'/calculador/trabajo/{trabajo_id}').get_data(as_text=True)
+    assert 'Diferencia: <strong>$-0.21</strong>' in pagina
+    assert 'Ninguna combinación queda dentro de la tolerancia' not in pagina
+
+
+def test_lote(cliente):
+    _cargar(cliente, [('A', '10.00'), ('B', '5.25'), ('C', '3.10')])
+    respuesta = cliente.post('/calculador/lote', data={'montos_objetivo': '8.35\n13.00'})
+    trabajo_id = respuesta.headers['Location'].rsplit('/', 1)[-1]
+    assert _esperar(cliente, trabajo_id)['estado'] == 'terminado'
+    pagina = cliente.get(f'/calculador/trabajo/{trabajo_id}').get_data(as_text=True)
+    assert '<td>$0.00</td>' in pagina and '<td>$3.00</td>' in pagina
+
+
+def test_cache_antes_de_cargar_la_planilla(cliente, monkeypatch):
+    _cargar(cliente, [('A', '10.00'), ('B', '5.25'), ('C', '3.10')])
+    assert _esperar(cliente, _encolar(cliente, '8.35'))['estado'] == 'terminado'
+
+    # Con el resultado en la caché, la planilla no se vuelve a cargar.
+    def cargar(clave):
+        raise AssertionError("No hacía falta cargar la planilla")
+    monkeypatch.setattr(almacen, 'cargar', cargar)
+    trabajo_id = _encolar(cliente, '8.35')
+    assert cliente.get(f'/calculador/trabajo/{trabajo_id}/estado').get_json()['estado'] == 'terminado'
+    assert 'Resultados del Calculador' in cliente.get(f'/calculador/trabajo/{trabajo_id}').get_data(as_text=True)
+
+
+def test_lote_con_archivo_de_objetivos_danado(cliente):
+    _cargar(cliente, [('A', '10.00'), ('B', '5.25')])
+    respuesta = cliente.post('/calculador/lote', data={'archivo_objetivos': (io.BytesIO(b'no es un zip'), 'objetivos.xlsx')},
+                             content_type='multipart/form-data')
+    assert respuesta.status_code == 200
+    assert 'Error al leer el archivo de objetivos' in respuesta.get_data(as_text=True)
@@ -0,0 +1,38 @@
+# test_dinero.py
+from decimal import Decimal, ROUND_CEILING, ROUND_FLOOR
+
+import pytest
+
+import dinero
+
+
+@pytest.mark.parametrize('valor, centavos', [
+    ('44881.94', 4488194), (' 12.5 ', 1250), ('-3', -300), ('.5', 50), ('7.', 700), ('+0.01', 1),
+    (44881.94, 4488194), (0.1, 10), (10, 1000), (Decimal('1.10'), 110), ('1e3', 100000),
+    ('1.005', 101), ('-1.005', -101),
+])
+def test_parsear(valor, centavos):
+    assert dinero.parsear(valor) == centavos
+
+
+@pytest.mark.parametrize('valor', ['abc', '', '-', '.', '1,5', 'nan', 'inf', None, True, float('nan')])
+def test_parsear_invalidos(valor):
+    with pytest.raises(ValueError):
+        dinero.parsear(valor)
+
+
+def test_escala_y_redondeo():
+    assert dinero.parsear('1.2345', escala=3) == 1235
+    assert dinero.parsear('1.2345', escala=3, redondeo=ROUND_FLOOR) == 1234
+    assert dinero.parsear('1.2341', escala=3, redondeo=ROUND_CEILING) == 1235
+    assert dinero.parsear('12', escala=0) == 12
+    assert dinero.parsear('0.5', escala=0) == 1
+
+
+def test_formatear_y_decimal():
+    assert dinero.formatear(4488194) == '44881.94'
+    assert dinero.formatear(-300) == '-3.00'
+    assert dinero.formatear(1) == '0.01'
+    assert dinero.formatear(-5, escala=3) == '-0.005'
+    assert dinero.formatear(12, escala=0) == '12'
+    assert dinero.a_decimal(1235, 3) == Decimal('1.235')
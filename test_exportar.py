@@ -0,0 +1,46 @@
+# test_exportar.py
+import io
+
+import openpyxl
+
+import exportar
+import ingesta
+from almacen import Dataset
+
+
+def _dataset():
+    return Dataset('0' * 64, ['R1', 'R2', 'R1', 'Ñ3', 'R1'], [1050, 300, 1050, 5, 1050])
+
+
+def test_marcar_respeta_repetidos():
+    combinacion = [['R1', '10.50'], ['Ñ3', '0.05'], ['R1', '10.5']]
+    assert list(exportar.marcar(_dataset(), combinacion)) == [
+        ('R1', 1050, True), ('R2', 300, False), ('R1', 1050, True), ('Ñ3', 5, True), ('R1', 1050, False)]
+
+
+def test_csv_se_vuelve_a_leer(tmp_path, monkeypatch):
+    monkeypatch.setattr(exportar, 'FILAS_POR_PARTE', 2)
+    filas = exportar.marcar(_dataset(), [['R2', '3.00']])
+    partes = list(exportar.en_partes('csv', filas, 2))
+    assert len(partes) == 3  # de a dos filas, más el resto
+    ruta = tmp_path / 'exportado.csv'
+    ruta.write_bytes(b''.join(partes))
+    datos = ingesta.leer_archivo(str(ruta))
+    assert datos.como_lista() == [['R1', '10.50'], ['R2', '3.00'], ['R1', '10.50'], ['Ñ3', '0.05'], ['R1', '10.50']]
+    assert ruta.read_text(encoding='utf-8-sig').splitlines()[1:3] == ['R1,10.50,No', 'R2,3.00,Sí']
+
+
+def test_xlsx(tmp_path):
+    filas = exportar.marcar(_dataset(), [['R1', '10.50']])
+    libro = openpyxl.load_workbook(io.BytesIO(b''.join(exportar.en_partes('xlsx', filas, 2))))
+    hoja = libro['Conciliación']
+    assert [tuple(c.value for c in fila) for fila in hoja.iter_rows()] == [
+        ('ID', 'Monto', 'Seleccionado'), ('R1', 10.5, 'Sí'), ('R2', 3, 'No'), ('R1', 10.5, 'No'),
+        ('Ñ3', 0.05, 'No'), ('R1', 10.5, 'No')]
+    assert hoja['B2'].number_format == '0.00'
+
+
+def test_opciones_adjunto():
+    assert exportar.opciones_adjunto('planilla.csv') == {'filename': 'planilla.csv'}
+    assert exportar.opciones_adjunto('Ñandú €.xlsx') == {
+        'filename': 'Nandu .xlsx', 'filename*': "UTF-8''%C3%91and%C3%BA%20%E2%82%AC.xlsx"}
@@ -0,0 +1,119 @@
+# test_ingesta.py
+import io
+
+import pandas as pd
+import pytest
+
+import ingesta
+
+
+def _xlsx(df):
+    archivo = io.BytesIO()
+    df.to_excel(archivo, index=False, engine='openpyxl')
+    archivo.seek(0)
+    return archivo
+
+
+@pytest.fixture(params=['xlsx', 'csv', 'pandas'])
+def leer(request, tmp_path):
+    # Las tres vías de lectura deben dar el mismo resultado para la misma planilla.
+    def leer_df(df):
+        if request.param == 'pandas':
+            return ingesta.leer_excel(_xlsx(df))
+        ruta = tmp_path / f"planilla.{request.param}"
+        if request.param == 'csv':
+            df.to_csv(ruta, index=False, sep=';')
+        else:
+            df.to_excel(ruta, index=False, engine='openpyxl')
+        return ingesta.leer_archivo(str(ruta))
+    return leer_df
+
+
+def test_lee_solo_id_y_monto_en_centavos(leer):
+    df = pd.DataFrame({'Fecha': ['x', 'y', 'z'], ' importe ': [44881.94, 10, 0.1],
+                       'Comprobante': ['R1', 'R2', 'R3']})
+    datos = leer(df)
+    assert (datos.columna_id, datos.columna_monto) == ('Comprobante', ' importe ')
+    assert datos.ids == ['R1', 'R2', 'R3']
+    assert list(datos.centavos) == [4488194, 1000, 10]
+    assert datos.omitidas == []
+    assert datos.como_lista() == [['R1', '44881.94'], ['R2', '10.00'], ['R3', '0.10']]
+
+
+def test_filas_invalidas_se_devuelven_con_motivo(leer):
+    df = pd.DataFrame({'ID': ['A', 'B', 'C', 'D'], 'Monto': ['12.5', 'abc', None, '-3']})
+    datos = leer(df)
+    assert datos.ids == ['A', 'D']
+    assert list(datos.centavos) == [1250, -300]
+    assert [(fila, item_id, motivo) for fila, item_id, _, motivo in datos.omitidas] == [
+        (3, 'B', 'monto no numérico'), (4, 'C', 'monto vacío')]
+
+
+def test_sin_columnas_reconocidas(leer):
+    with pytest.raises(ingesta.ErrorIngesta, match='Columnas ID/Monto no encontradas'):
+        leer(pd.DataFrame({'Cliente': ['A'], 'Monto': [1]}))
+
+
+def test_planilla_de_ejemplo():
+    streaming = ingesta.leer_archivo('uploads/Montos y remitos.xlsx')
+    con_pandas = ingesta.leer_excel('uploads/Montos y remitos.xlsx')
+    assert len(streaming) == 161
+    assert streaming.centavos[0] == 4488194
+    assert streaming.ids == con_pandas.ids
+    assert streaming.centavos == con_pandas.centavos
+
+
+def test_extension_desconocida():
+    with pytest.raises(ingesta.ErrorIngesta):
+        ingesta.leer_archivo('/tmp/planilla.ods')
+
+
+@pytest.mark.parametrize('extension', ['xlsx', 'csv'])
+def test_leer_objetivos(tmp_path, extension):
+    df = pd.DataFrame({'Cliente': ['x', 'y', 'z'], 'Total': [1500.5, None, 20]})
+    ruta = tmp_path / f"objetivos.{extension}"
+    if extension == 'csv':
+        df.to_csv(ruta, index=False)
+    else:
+        df.to_excel(ruta, index=False, engine='openpyxl')
+    assert [float(m) for m in ingesta.leer_objetivos(str(ruta))] == [1500.5, 20]
+
+
+def test_leer_objetivos_sin_encabezado(tmp_path):
+    ruta = tmp_path / 'objetivos.csv'
+    ruta.write_text('1000.00\n2000.00\n3000.50\n', encoding='utf-8')
+    assert ingesta.leer_objetivos(str(ruta)) == ['1000.00', '2000.00', '3000.50']
+    ruta.write_text('Objetivos\n1000.00\n', encoding='utf-8')  # Encabezado no reconocido, pero no es un número.
+    assert ingesta.leer_objetivos(str(ruta)) == ['1000.00']
+
+
+def test_leer_objetivos_con_coma_decimal(tmp_path):
+    ruta = tmp_path / 'objetivos.csv'
+    ruta.write_text('Monto\n1,50\n2500,75\n', encoding='utf-8')
+    with pytest.raises(ingesta.ErrorIngesta, match='fila 2'):
+        ingesta.leer_objetivos(str(ruta))
+
+
+def test_csv_con_columnas_de_mas(tmp_path):
+    ruta = tmp_path / 'planilla.csv'
+    ruta.write_text('ID,Monto\nA,1,50\nB,2.25\nC,3,\n', encoding='utf-8')
+    datos = ingesta.leer_archivo(str(ruta))
+    assert datos.como_lista() == [['B', '2.25'], ['C', '3.00']]  # Una columna vacía de más no molesta.
+    assert [(fila, item_id, motivo) for fila, item_id, _, motivo in datos.omitidas] == [(2, 'A', 'columnas de más')]
+
+
+def test_csv_en_cp1252(tmp_path):
+    ruta = tmp_path / 'planilla.csv'
+    ruta.write_bytes('Número;Importe\nRemito Ñ1;1500.50\n'.encode('cp1252'))
+    datos = ingesta.leer_archivo(str(ruta))
+    assert datos.columna_id == 'Número'
+    assert datos.como_lista() == [['Remito Ñ1', '1500.50']]
+
+
+def test_escala_explicita(tmp_path):
+    ruta = tmp_path / 'planilla.csv'
+    ruta.write_text('ID;Monto\nA;1.2345\nB;7\n', encoding='utf-8')
+    datos = ingesta.leer_archivo(str(ruta), escala=3)
+    assert datos.escala == 3
+    assert list(datos.centavos) == [1235, 7000]
+    assert datos.como_lista() == [['A', '1.235'], ['B', '7.000']]
@@ -0,0 +1,360 @@
+# test_solver.py
+import random
+from decimal import Decimal
+from itertools import combinations, islice
+
+import pytest
+
+import solver as solver_mod
+from solver import CombinacionSolver, LoteSolver
+
+
+def _items_aleatorios(seed, n, minimo=1, maximo=5000):
+    rng = random.Random(seed)
+    return [[f"R{i:04d}", f"{rng.randint(minimo, maximo) / 100:.2f}"] for i in range(n)]
+
+
+def _optimo_fuerza_bruta(items, objetivo):
+    montos = [Decimal(m) for _, m in items]
+    mejor = Decimal('0')
+    for r in range(1, len(montos) + 1):
+        for combo in combinations(montos, r):
+            s = sum(combo)
+            if mejor < s <= objetivo:
+                mejor = s
+    return mejor
+
+
+@pytest.mark.parametrize('engine', ['bnb', 'dp', 'mitm', 'auto'])
+@pytest.mark.parametrize('seed', range(5))
+def test_motores_encuentran_el_optimo(engine, seed):
+    items = _items_aleatorios(seed, 12)
+    objetivo = Decimal(random.Random(seed).randint(1000, 15000)) / 100
+    esperado = _optimo_fuerza_bruta(items, objetivo)
+
+    solver = CombinacionSolver(items, str(objetivo), engine=engine)
+    combinacion, suma, monto_objetivo, time_exceeded = solver.find_combination()
+
+    assert not time_exceeded
+    assert monto_objetivo == objetivo
+    assert suma == esperado
+    assert sum(monto for _, monto in combinacion) == suma
+    ids = [item_id for item_id, _ in combinacion]
+    assert len(ids) == len(set(ids))
+
+
+def test_auto_elige_motor_por_tamano():
+    pocos = CombinacionSolver(_items_aleatorios(0, 30, 100000, 9000000), '100000000')
+    assert pocos.select_engine() == 'mitm'
+    # Pocos montos distintos: los cubos dejan a 'bnb' un espacio chico, aunque haya 30 filas.
+    repetidos = CombinacionSolver([[f"R{i}", ('123457.01', '98765.43', '55010.10', '300199.99', '42000.07')[i % 5]]
+                                   for i in range(30)], '100000000')
+    assert repetidos.select_engine() == 'bnb'
+    assert CombinacionSolver(_items_aleatorios(0, 38, 100000, 9000000), '100000000').select_engine() == 'bnb'
+    muchos = CombinacionSolver(_items_aleatorios(0, 300, 100000, 9000000), '100000000')
+    assert muchos.select_engine() == 'bnb'
+    objetivo_chico = CombinacionSolver(_items_aleatorios(0, 300), '500')
+    assert objetivo_chico.select_engine() == 'dp'
+
+
+def test_dp_cientos_de_filas_exacto():
+    items = _items_aleatorios(7, 300)
+    solver = CombinacionSolver(items, '1234.56', engine='dp')
+    _, suma, _, time_exceeded = solver.find_combination()
+    assert not time_exceeded
+    assert suma == Decimal('1234.56')
+
+
+def test_objetivo_invalido_y_no_positivo():
+    with pytest.raises(ValueError):
+        CombinacionSolver([['A', '1']], 'abc')
+    with pytest.raises(ValueError):
+        CombinacionSolver([['A', '1']], '10', engine='otro')
+    assert CombinacionSolver([['A', '1']], '0').find_combination() == ([], Decimal('0'), Decimal('0'), False)
+
+
+def test_items_invalidos_se_omiten():
+    items = [['A', 'abc'], ['B', '-5'], ['C', '3.50'], ['D', '2']]
+    combinacion, suma, _, _ = CombinacionSolver(items, '6').find_combination()
+    assert suma == Decimal('5.50')
+    assert sorted(item_id for item_id, _ in combinacion) == ['C', 'D']
+
+
+def test_montos_enteros_en_la_escala_del_dataset():
+    # unidades=True: enteros ya convertidos, como vienen del almacén.
+    items = [('A', 1235), ('B', 2500), ('C', 4001), ('D', 0)]
+    solver = CombinacionSolver(items, '3.7359', escala=3, unidades=True)
+    assert solver.objetivo_centavos == 3735
+    combinacion, suma, _, _ = solver.find_combination()
+    assert suma == Decimal('3.735')
+    assert sorted(combinacion) == [('A', Decimal('1.235')), ('B', Decimal('2.500'))]
+
+
+def test_monto_entero_sin_unidades_es_en_pesos():
+    solver = CombinacionSolver([('A', '0.05'), ('B', 5)], '5', escala=2)
+    assert sorted(item.centavos for item in solver.items_procesados) == [5, 500]
+    assert solver.find_combination()[:2] == ([('B', Decimal('5.00'))], Decimal('5.00'))
+
+
+def test_bnb_agrupa_montos_repetidos():
+    items = [[f"A{i}", '10.00'] for i in range(40)] + [[f"B{i}", '3.00'] for i in range(40)]
+    solver = CombinacionSolver(items, '157.00', engine='bnb')
+    assert solver.montos_cubo == [1000, 300]
+    assert solver.cantidad_cubo == [40, 40]
+    combinacion, suma, _, time_exceeded = solver.find_combination()
+    assert not time_exceeded
+    assert suma == Decimal('157.00')
+    assert sum(monto for _, monto in combinacion) == suma
+
+
+def test_bnb_sin_limite_de_recursion():
+    items = [[f"R{i}", f"{i}.01"] for i in range(1, 3001)]
+    _, suma, _, time_exceeded = CombinacionSolver(items, '0.02', engine='bnb').find_combination()
+    assert not time_exceeded
+    assert suma == Decimal('0.00')
+
+
+def test_corta_apenas_alcanza_el_objetivo_exacto():
+    items = [[f"R{i}", f"{i}.01"] for i in range(1, 3001)]
+    combinacion, suma, _, time_exceeded = CombinacionSolver(items, '2500.03', engine='bnb').find_combination()
+    assert not time_exceeded
+    assert suma == Decimal('2500.03')
+
+
+@pytest.mark.parametrize('engine', ['bnb', 'dp', 'mitm'])
+def test_iter_improvements_reporta_mejoras_crecientes(engine):
+    items = _items_aleatorios(3, 14)
+    solver = CombinacionSolver(items, '400.00', engine=engine)
+    mejoras = list(solver.iter_improvements())
+    assert mejoras
+    sumas = [m.suma for m in mejoras]
+    assert sumas == sorted(set(sumas))
+    assert all(sum(monto for _, monto in m.combinacion) == m.suma for m in mejoras)
+    assert mejoras[-1].suma == CombinacionSolver(items, '400.00', engine=engine).find_combination()[1]
+
+
+def test_progress_callback_puede_aceptar_antes():
+    items = _items_aleatorios(4, 60, 100000, 900000)
+    vistas = []
+
+    def aceptar_la_primera(mejora):
+        vistas.append(mejora)
+        return True
+
+    combinacion, suma, _, _ = CombinacionSolver(items, '500000.00', engine='bnb').find_combination(aceptar_la_primera)
+    assert len(vistas) == 1
+    assert suma == vistas[0].suma
+    assert combinacion == vistas[0].combinacion
+
+
+@pytest.mark.parametrize('seed', range(6))
+def test_paralelo_identico_al_serial(seed):
+    rng = random.Random(seed)
+    items = [[f"R{i}", f"{rng.choice([1, 2, 5, 10, 25]) * rng.randint(100, 400) / 100:.2f}"] for i in range(45)]
+    objetivo = f"{rng.randint(10000, 60000) / 100:.2f}"
+    serial = CombinacionSolver(items, objetivo, engine='bnb').find_combination()
+    paralelo = CombinacionSolver(items, objetivo, engine='bnb', workers=3).find_combination()
+    assert paralelo == serial
+
+
+def test_paralelo_sin_exacto_recorre_todo_igual_que_serial():
+    rng = random.Random(11)
+    items = [[f"R{i}", f"{rng.randint(50, 900) * 2 / 100:.2f}"] for i in range(26)]
+    serial = CombinacionSolver(items, '75.01', engine='bnb').find_combination()
+    paralelo = CombinacionSolver(items, '75.01', engine='bnb', workers=4).find_combination()
+    assert serial[1] == Decimal('75.00')
+    assert paralelo == serial
+
+
+@pytest.mark.parametrize('cola_max_bits', [1, 1 << 9, 1 << 12, 1 << 18])
+@pytest.mark.parametrize('seed', range(4))
+def test_bnb_con_tablas_de_cola_encuentra_el_optimo(monkeypatch, cola_max_bits, seed):
+    # Con distintos tamaños de cola, desde ninguna (sólo ramificación) hasta el problema entero.
+    monkeypatch.setattr(solver_mod, 'COLA_MAX_BITS', cola_max_bits)
+    rng = random.Random(seed)
+    items = [[f"R{i}", f"{rng.choice([3, 5, 7, 12, 40, 99]) * rng.randint(1, 30) / 100:.2f}"] for i in range(14)]
+    objetivo = Decimal(rng.randint(100, 3000)) / 100
+    esperado = _optimo_fuerza_bruta(items, objetivo)
+    for workers in (1, 3):
+        combinacion, suma, _, _ = CombinacionSolver(items, str(objetivo), engine='bnb', workers=workers).find_combination()
+        assert suma == esperado
+        assert sum(monto for _, monto in combinacion) == suma
+        assert len({item_id for item_id, _ in combinacion}) == len(combinacion)
+
+
+@pytest.mark.parametrize('engine', ['bnb', 'dp', 'mitm'])
+def test_objetivo_no_multiplo_del_mcd_termina_sin_agotar_tiempo(engine):
+    # Todos los montos son múltiplos de 0.05: 100.02 es imposible y 100.00 ya es el óptimo.
+    items = [[f"R{i}", f"{(21 + 13 * i) * 5 / 100:.2f}"] for i in range(30)]
+    solver = CombinacionSolver(items, '100.02', engine=engine, time_limit_seconds=5)
+    assert solver.objetivo_alcanzable == 10000
+    _, suma, _, time_exceeded = solver.find_combination()
+    assert suma == Decimal('100.00')
+    assert not time_exceeded
+
+
+def _mas_cercana_fuerza_bruta(items, objetivo, aceptable):
+    montos = [Decimal(m) for _, m in items]
+    sumas = [sum(combo) for r in range(1, len(montos) + 1) for combo in combinations(montos, r)]
+    return min((s for s in sumas if aceptable(s)), key=lambda s: (abs(s - objetivo), s), default=None)
+
+
+@pytest.mark.parametrize('engine', ['bnb', 'dp', 'mitm'])
+@pytest.mark.parametrize('seed', range(5))
+def test_modo_mayor_igual(engine, seed):
+    items = _items_aleatorios(seed, 12)
+    objetivo = Decimal(random.Random(seed).randint(1000, 15000)) / 100
+    esperado = _mas_cercana_fuerza_bruta(items, objetivo, lambda s: s >= objetivo)
+
+    for workers in (1, 2) if engine == 'bnb' else (1,):
+        solver = CombinacionSolver(items, str(objetivo), engine=engine, workers=workers, modo='mayor_igual')
+        combinacion, suma, _, time_exceeded = solver.find_combination()
+        assert not time_exceeded
+        assert suma == (esperado or 0)
+        assert sum(monto for _, monto in combinacion) == suma
+
+
+@pytest.mark.parametrize('engine', ['bnb', 'dp', 'mitm'])
+@pytest.mark.parametrize('seed', range(5))
+def test_modo_tolerancia(engine, seed):
+    items = _items_aleatorios(seed, 12)
+    rng = random.Random(seed)
+    objetivo = Decimal(rng.randint(1000, 15000)) / 100
+    tolerancia = Decimal(rng.randint(0, 300)) / 100
+    esperado = _mas_cercana_fuerza_bruta(items, objetivo, lambda s: s <= objetivo + tolerancia)
+
+    for workers in (1, 2) if engine == 'bnb' else (1,):
+        solver = CombinacionSolver(items, str(objetivo), engine=engine, workers=workers, modo='tolerancia',
+                                   tolerancia=str(tolerancia))
+        combinacion, suma, _, _ = solver.find_combination()
+        assert abs(suma - objetivo) == abs(esperado - objetivo)
+        assert suma <= objetivo + tolerancia
+        assert sum(monto for _, monto in combinacion) == suma
+
+
+@pytest.mark.parametrize('engine', ['bnb', 'dp', 'mitm'])
+@pytest.mark.parametrize('sin_cola', [False, True])
+def test_modo_tolerancia_no_prefiere_la_combinacion_vacia(monkeypatch, engine, sin_cola):
+    # 0.40 se pasa de 0.19 en más que 0.19, pero entra en la tolerancia: es mejor que nada.
+    if sin_cola:
+        monkeypatch.setattr(solver_mod, 'COLA_MAX_BITS', 0)
+    for workers in (1, 2) if engine == 'bnb' else (1,):
+        solver = CombinacionSolver([['A', '0.40']], '0.19', engine=engine, workers=workers, modo='tolerancia',
+                                   tolerancia='1.75')
+        assert solver.find_combination()[:2] == ([('A', Decimal('0.40'))], Decimal('0.40'))
+    items = [['A', '0.40'], ['B', '0.90'], ['C', '3.00']]
+    solver = CombinacionSolver(items, '0.19', engine=engine, modo='tolerancia', tolerancia='1.75')
+    assert solver.find_combination()[1] == Decimal('0.40')
+    # Si nada entra en la tolerancia, no hay combinación.
+    solver = CombinacionSolver([['C', '3.00']], '0.19', engine=engine, modo='tolerancia', tolerancia='1.75')
+    assert solver.find_combination()[:2] == ([], Decimal('0'))
+
+
+def test_modo_mayor_igual_sin_solucion_y_con_todos():
+    items = [['A', '10.00'], ['B', '5.50']]
+    assert CombinacionSolver(items, '15.51', modo='mayor_igual').find_combination()[:2] == ([], Decimal('0'))
+    combinacion, suma, _, _ = CombinacionSolver(items, '15.50', modo='mayor_igual').find_combination()
+    assert suma == Decimal('15.50') and len(combinacion) == 2
+
+
+def test_modo_y_tolerancia_invalidos():
+    with pytest.raises(ValueError):
+        CombinacionSolver([['A', '1']], '10', modo='exacto')
+    with pytest.raises(ValueError):
+        CombinacionSolver([['A', '1']], '10', modo='tolerancia', tolerancia='-1')
+    with pytest.raises(ValueError):
+        CombinacionSolver([['A', '1']], '10', modo='tolerancia', tolerancia='abc')
+
+
+def test_clave_cache_distingue_modos():
+    claves = {CombinacionSolver([['A', '1']], '10', modo=modo, tolerancia=tolerancia).clave_cache
+              for modo, tolerancia in [('menor_igual', '0'), ('mayor_igual', '0'), ('tolerancia', '1'),
+                                       ('tolerancia', '2')]}
+    assert len(claves) == 4
+    assert CombinacionSolver([['A', '1']], '10').clave_cache == 'auto'
+
+
+@pytest.mark.parametrize('sin_tabla', [False, True])
+def test_iter_combinaciones_suma_exacta(monkeypatch, sin_tabla):
+    if sin_tabla:
+        monkeypatch.setattr(solver_mod, 'DP_MAX_BITS', 0)  # Fuerza la búsqueda en profundidad.
+    items = _items_aleatorios(3, 12, 1, 40)
+    montos = {item_id: Decimal(m) for item_id, m in items}
+    solver = CombinacionSolver(items, '1.50')
+    _, mejor, _, _ = solver.find_combination()
+    esperadas = {frozenset(combo) for r in range(1, 13) for combo in combinations(montos, r)
+                 if sum(montos[i] for i in combo) == mejor}
+
+    # Las primeras son las de la mejor suma (sin tabla, son las únicas que se generan).
+    vistas = [frozenset(item_id for item_id, _ in a.combinacion) for a in solver.iter_combinaciones()]
+    assert len(vistas) == len(set(vistas))
+    assert set(vistas[:len(esperadas)]) == esperadas
+    assert len(vistas) > len(esperadas) or sin_tabla
+    assert {frozenset(i for i, _ in a.combinacion) for a in solver.iter_combinaciones(suma=mejor)} == esperadas
+
+
+def test_iter_combinaciones_de_la_mas_cercana_en_adelante():
+    items = _items_aleatorios(4, 10)
+    solver = CombinacionSolver(items, '80.00')
+    sumas = [a.suma for a in solver.iter_combinaciones()]
+    assert sumas[0] == solver.find_combination()[1]
+    assert sumas == sorted(sumas, reverse=True)
+    assert len(sumas) == sum(1 for r in range(1, 11) for combo in combinations(items, r)
+                             if sum(Decimal(m) for _, m in combo) <= Decimal('80.00'))
+
+
+def test_iter_combinaciones_es_perezoso():
+    # C(60, 30) combinaciones suman 30.00: sólo se generan las que se piden.
+    items = [[f"R{i}", '1.00'] for i in range(60)]
+    solver = CombinacionSolver(items, '30.00', time_limit_seconds=5)
+    primeras = list(islice(solver.iter_combinaciones(), 5))
+    assert len(primeras) == 5
+    assert all(a.suma == Decimal('30.00') and len(a.combinacion) == 30 for a in primeras)
+    assert len({frozenset(i for i, _ in a.combinacion) for a in primeras}) == 5
+
+
+def test_estadisticas_de_busqueda():
+    rng = random.Random(11)
+    items = [[f"R{i}", f"{rng.randint(50, 900) * 2000 / 100:.2f}"] for i in range(26)]
+    solver = CombinacionSolver(items, '75000.01', engine='bnb')
+    solver.find_combination()
+    e = solver.estadisticas
+    assert e.engine == 'bnb'
+    assert e.nodos == solver.nodos_explorados > 0
+    assert e.podas_cota > 0 and e.podas_capacidad > 0
+    assert 0 < e.profundidad <= len(solver.montos_cubo)
+    assert e.mejoras > 0
+    assert 0 <= e.primera_mejora <= e.ultima_mejora <= e.segundos
+
+    paralelo = CombinacionSolver(items, '75000.01', engine='bnb', workers=4)
+    paralelo.find_combination()
+    assert paralelo.estadisticas.engine == 'bnb x4'
+    assert paralelo.estadisticas.nodos > 0 and paralelo.estadisticas.podas_cota > 0
+
+
+@pytest.mark.parametrize('engine', ['auto', 'bnb'])
+def test_lote_igual_que_objetivos_sueltos(engine):
+    items = _items_aleatorios(5, 40)
+    objetivos = ['100.00', '0', '523.17', '2500', '7.5']
+    resultados = list(LoteSolver(items, objetivos, engine=engine).iter_resultados())
+    assert [r.monto_objetivo for r in resultados] == [Decimal(o) for o in objetivos]
+    for objetivo, resultado in zip(objetivos, resultados):
+        _, suma, _, _ = CombinacionSolver(items, objetivo, engine=engine).find_combination()
+        assert resultado.suma == suma
+        assert sum(monto for _, monto in resultado.combinacion) == resultado.suma
+        assert not resultado.time_exceeded
+
+
+def test_lote_sin_repetir_items():
+    items = [['A', '10'], ['B', '10'], ['C', '5'], ['D', '5'], ['E', '1']]
+    resultados = list(LoteSolver(items, ['20', '20', '20'], sin_repetir=True).iter_resultados())
+    assert [r.suma for r in resultados] == [Decimal('20'), Decimal('11'), Decimal('0')]
+    usados = [item_id for r in resultados for item_id, _ in r.combinacion]
+    assert len(usados) == len(set(usados)) == 5
+
+
+def test_lote_objetivo_invalido():
+    with pytest.raises(ValueError, match="'abc'"):
+        LoteSolver([['A', '1']], ['10', 'abc'])
+    with pytest.raises(ValueError):
+        LoteSolver([['A', '1']], [])
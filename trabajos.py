@@ -0,0 +1,266 @@
+# Contador/trabajos.py
+# Cola de búsquedas del calculador: la request crea un TrabajoCalculo y responde enseguida,
+# y un pool de hilos de este mismo proceso ejecuta el CombinacionSolver y guarda el resultado.
+# Mientras busca, cada trabajo consulta en la base si le pidieron aceptar (el pedido puede llegar
+# a otro worker) y renueva el latido de los trabajos de su proceso: los que dejan de latir
+# (el proceso se reinició) se marcan como error al leerlos.
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from itertools import islice
+
+from flask import current_app
+
+import dinero
+import metricas
+from cache_resultados import ResultadoCacheado
+from extensions import db
+from models import TrabajoCalculo
+
+# Mínimo de segundos entre escrituras de la mejor combinación parcial en la base.
+PROGRESO_INTERVALO = 1.0
+# Segundos entre consultas a la base del trabajo en curso (pedido de aceptar y latido).
+LATIDO_INTERVALO = 1.0
+
+_pool = None
+_pool_lock = threading.Lock()
+# Trabajos de este proceso (en cola o corriendo): id -> Event que pide aceptar la mejor
+# combinación actual. Cuando el pedido llega a este mismo proceso se corta sin esperar el latido.
+_aceptar = {}
+
+
+def _obtener_pool(max_workers):
+    # Se crea en el primer uso, así cada worker de gunicorn (post-fork) tiene sus propios hilos.
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='calculador')
+        return _pool
+
+
+def _texto(monto, escala):
+    # Los montos se guardan como texto con los decimales de la escala de la planilla.
+    return f"{monto:.{escala}f}"
+
+
+def _combinacion_json(combinacion, escala):
+    return [[item_id, _texto(monto, escala)] for item_id, monto in combinacion]
+
+
+def _resultado_json(solver, combinacion, suma, time_exceeded, parcial, cacheado=False):
+    return json.dumps({
+        'combinacion': combinacion if cacheado else _combinacion_json(combinacion, solver.escala),
+        'suma': suma if cacheado else _texto(suma, solver.escala),
+        'monto_objetivo': _texto(solver.monto_objetivo, solver.escala),
+        'escala': solver.escala,
+        'modo': solver.modo,
+        # La tolerancia que se usó, ya llevada a la escala (ver CombinacionSolver).
+        'tolerancia': dinero.formatear(solver.tolerancia_centavos, solver.escala),
+        'time_exceeded': time_exceeded,
+        'time_limit': solver.time_limit_seconds,
+        'aceptado': solver.detenido,
+        'parcial': parcial,
+        'nodos': solver.nodos_explorados,
+        'estadisticas': None if cacheado else solver.estadisticas.como_dict(),
+        'cacheado': cacheado,
+    })
+
+
+def _resultado_lote_json(lote, resultados, parcial):
+    escala = lote.solver.escala
+    return json.dumps({
+        'resultados': [{
+            'monto_objetivo': _texto(r.monto_objetivo, escala),
+            'combinacion': _combinacion_json(r.combinacion, escala),
+            'suma': _texto(r.suma, escala),
+            'time_exceeded': r.time_exceeded,
+        } for r in resultados],
+        'escala': escala,
+        'sin_repetir': lote.sin_repetir,
+        'time_limit': lote.solver.time_limit_seconds,
+        'aceptado': lote.solver.detenido,
+        'parcial': parcial,
+    })
+
+
+def _registrar(trabajo, tarea):
+    """Guarda el trabajo y, si no quedó ya terminado, envía tarea(app, trabajo, evento) al pool."""
+    app = current_app._get_current_object()
+    db.session.add(trabajo)
+    db.session.commit()
+    if trabajo.finalizado:
+        return trabajo
+    evento = threading.Event()
+    _aceptar[trabajo.id] = evento
+    _obtener_pool(app.config['SOLVER_MAX_JOBS']).submit(_ejecutar, app, trabajo.id, tarea, evento)
+    return trabajo
+
+
+def _nuevo_trabajo(solver, user_id, filename, dataset):
+    return TrabajoCalculo(id=uuid.uuid4().hex, user_id=user_id, filename=filename, dataset=dataset,
+                          monto_objetivo=_texto(solver.monto_objetivo, solver.escala))
+
+
+def encolar_desde_cache(solver, user_id, filename, dataset):
+    """Si la búsqueda ya está en la caché de resultados, registra el trabajo ya terminado y lo
+    devuelve; si no, None.
+
+    Del solver sólo se usan el objetivo, el motor y el modo, así que puede no tener items: la
+    request consulta la caché sin cargar la planilla ni armar el CombinacionSolver completo.
+    """
+    cacheado = current_app.extensions['cache_resultados'].obtener(
+        dataset, solver.objetivo_centavos, solver.clave_cache, solver.time_limit_seconds)
+    if cacheado is None:
+        return None
+    # Misma planilla, objetivo, motor y modo: no hace falta volver a buscar.
+    trabajo = _nuevo_trabajo(solver, user_id, filename, dataset)
+    trabajo.estado = 'terminado'
+    trabajo.iniciado = trabajo.terminado = datetime.utcnow()
+    trabajo.resultado = _resultado_json(solver, cacheado.combinacion, cacheado.suma,
+                                        cacheado.time_exceeded, False, cacheado=True)
+    current_app.logger.info(f"Trabajo {trabajo.id} resuelto desde la caché de resultados.")
+    return _registrar(trabajo, None)
+
+
+def encolar(solver, user_id, filename, dataset, alternativas=0):
+    """Registra el trabajo y lo envía al pool. Devuelve el TrabajoCalculo recién creado.
+
+    No consulta la caché de resultados: eso se hace antes, con encolar_desde_cache(). Con
+    alternativas > 0 también se guardan hasta esa cantidad de combinaciones, de la más
+    cercana al objetivo en adelante (ver CombinacionSolver.iter_combinaciones).
+    """
+    trabajo = _nuevo_trabajo(solver, user_id, filename, dataset)
+    return _registrar(trabajo, partial(_buscar_combinacion, solver, alternativas))
+
+
+def encolar_lote(lote, user_id, filename, dataset):
+    """Como encolar(), para un LoteSolver con varios montos objetivo."""
+    trabajo = TrabajoCalculo(id=uuid.uuid4().hex, user_id=user_id, filename=filename, dataset=dataset,
+                             tipo='lote')
+    return _registrar(trabajo, partial(_resolver_lote, lote))
+
+
+def aceptar(trabajo):
+    """Pide cortar la búsqueda y quedarse con la mejor combinación hasta el momento."""
+    trabajo.aceptar_pedido = True
+    db.session.commit()
+    evento = _aceptar.get(trabajo.id)
+    if evento is not None:
+        evento.set()
+
+
+def marcar_si_abandonado(trabajo):
+    """Si el proceso que tenía el trabajo dejó de dar señales (se reinició o murió), lo marca
+    como error: si no, la página del trabajo se recargaría para siempre.
+    """
+    if trabajo.finalizado:
+        return
+    limite = current_app.config.get('SOLVER_TRABAJO_ABANDONO', 60)
+    if (datetime.utcnow() - (trabajo.latido or trabajo.creado)).total_seconds() <= limite:
+        return
+    trabajo.estado = 'error'
+    trabajo.error = "La búsqueda se interrumpió porque el servidor se reinició. Por favor, vuelve a intentarlo."
+    trabajo.terminado = datetime.utcnow()
+    db.session.commit()
+    current_app.logger.warning(f"Trabajo {trabajo.id} sin latido desde {trabajo.latido}: marcado como error.")
+
+
+def _latir(trabajo_id):
+    """Renueva el latido de los trabajos de este proceso y devuelve si pidieron aceptar trabajo_id."""
+    db.session.execute(db.update(TrabajoCalculo).where(TrabajoCalculo.id.in_(list(_aceptar)))
+                       .values(latido=datetime.utcnow()))
+    pedido = db.session.execute(db.select(TrabajoCalculo.aceptar_pedido)
+                                .where(TrabajoCalculo.id == trabajo_id)).scalar()
+    db.session.commit()
+    return bool(pedido)
+
+
+def _vigilante(trabajo_id, evento):
+    """detener() para el solver: corta si pidieron aceptar en este proceso o, consultando la base
+    cada LATIDO_INTERVALO segundos, en cualquier otro.
+    """
+    ultima_consulta = [time.monotonic()]
+
+    def detener():
+        if evento.is_set():
+            return True
+        ahora = time.monotonic()
+        if ahora - ultima_consulta[0] >= LATIDO_INTERVALO:
+            ultima_consulta[0] = ahora
+            if _latir(trabajo_id):
+                evento.set()
+        return evento.is_set()
+    return detener
+
+
+def _buscar_combinacion(solver, alternativas, app, trabajo, detener):
+    ultimo_guardado = [0.0]
+
+    def guardar_progreso(mejora):
+        ahora = time.monotonic()
+        if ahora - ultimo_guardado[0] >= PROGRESO_INTERVALO:
+            ultimo_guardado[0] = ahora
+            trabajo.resultado = _resultado_json(solver, mejora.combinacion, mejora.suma, False, True)
+            db.session.commit()
+        return False
+
+    combinacion, suma, _, time_exceeded = solver.find_combination(guardar_progreso, detener=detener)
+    trabajo.resultado = _resultado_json(solver, combinacion, suma, time_exceeded, False)
+    estadisticas = solver.estadisticas.como_dict()
+    metricas.registrar_busqueda(estadisticas, trabajo=trabajo.id, items=solver.num_items,
+                                time_exceeded=time_exceeded, aceptado=solver.detenido)
+    app.logger.info(f"Trabajo {trabajo.id} estadísticas: {estadisticas}")
+    if not solver.detenido and trabajo.dataset:
+        # Lo que el usuario cortó a mano no se guarda: otra búsqueda podría llegar más lejos.
+        resultado = json.loads(trabajo.resultado)
+        app.extensions['cache_resultados'].guardar(
+            trabajo.dataset, solver.objetivo_centavos, solver.clave_cache,
+            ResultadoCacheado(resultado['combinacion'], resultado['suma'], time_exceeded,
+                              solver.time_limit_seconds))
+    if alternativas and not solver.detenido:
+        resultado = json.loads(trabajo.resultado)
+        resultado['alternativas'] = [
+            {'suma': _texto(a.suma, solver.escala), 'combinacion': _combinacion_json(a.combinacion, solver.escala)}
+            for a in islice(solver.iter_combinaciones(detener=detener), alternativas)]
+        trabajo.resultado = json.dumps(resultado)
+
+
+def _resolver_lote(lote, app, trabajo, detener):
+    resultados = []
+    ultimo_guardado = time.monotonic()
+    for resultado in lote.iter_resultados(detener=detener):
+        resultados.append(resultado)
+        if time.monotonic() - ultimo_guardado >= PROGRESO_INTERVALO:
+            ultimo_guardado = time.monotonic()
+            trabajo.resultado = _resultado_lote_json(lote, resultados, True)
+            db.session.commit()
+    trabajo.resultado = _resultado_lote_json(lote, resultados, False)
+
+
+def _ejecutar(app, trabajo_id, tarea, evento):
+    with app.app_context():
+        trabajo = db.session.get(TrabajoCalculo, trabajo_id)
+        try:
+            trabajo.estado = 'en_proceso'
+            trabajo.iniciado = trabajo.latido = datetime.utcnow()
+            db.session.commit()
+            tarea(app, trabajo, _vigilante(trabajo_id, evento))
+            trabajo.estado = 'terminado'
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Error en trabajo {trabajo_id}: {e}", exc_info=True)
+            trabajo.estado = 'error'
+            trabajo.error = str(e)
+        finally:
+            _aceptar.pop(trabajo_id, None)
+            trabajo.terminado = datetime.utcnow()
+            db.session.commit()
+            espera = (trabajo.iniciado - trabajo.creado).total_seconds() if trabajo.iniciado else 0
+            duracion = (trabajo.terminado - trabajo.iniciado).total_seconds() if trabajo.iniciado else 0
+            app.logger.info(f"Trabajo {trabajo_id} {trabajo.estado}: espera {espera:.2f}s, búsqueda {duracion:.2f}s.")
+            metricas.registrar_fase('trabajo.espera', espera)
+            metricas.registrar_fase(f'trabajo.{trabajo.tipo}', duracion)